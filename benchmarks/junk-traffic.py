@@ -0,0 +1,50 @@
+"""
+Measures how fast a natsapi service turns away junk: requests on subjects without a route,
+and requests over the max payload of a route. Needs a NATS server on localhost:4222.
+
+    poetry run python junk-traffic.py [number of requests] [payload bytes]
+"""
+
+import asyncio
+import sys
+import time
+
+from natsapi import NatsAPI
+from natsapi.client import Config
+from natsapi.client.config import ConnectConfig
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+PAYLOAD_BYTES = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+CONCURRENCY = 100
+
+app = NatsAPI("bench", client_config=Config(connect=ConnectConfig(servers="nats://127.0.0.1:4222")))
+
+
+@app.request("upload", max_payload=1024)
+async def upload(app, data: str):
+    return {"size": len(data)}
+
+
+async def flood(subject: str, payload: bytes) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            await app.nc.nats.request(subject, payload, timeout=10)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(N)])
+    return time.perf_counter() - started
+
+
+async def main():
+    await app.startup(loop=asyncio.get_running_loop())
+    payload = b'{"jsonrpc": "2.0", "params": {"data": "' + b"x" * PAYLOAD_BYTES + b'"}, "timeout": 10}'
+    for name, subject in (("unroutable", "bench.nonexistant"), ("oversized", "bench.upload")):
+        elapsed = await flood(subject, payload)
+        print(f"{name:>10}: {N} requests of {len(payload)} bytes in {elapsed:.2f}s, {N / elapsed:.0f} req/s")
+    await app.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+Measures request throughput of a natsapi service and its client over 1, 2, 4 and 8 pooled connections.
+Needs a NATS server on localhost:4222.
+
+    poetry run python pool-scaling.py [number of requests] [payload bytes]
+"""
+
+import asyncio
+import sys
+import time
+
+from natsapi import NatsAPI
+from natsapi.client import Config, NatsClient
+from natsapi.client.config import ConnectConfig
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+PAYLOAD_BYTES = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+CONCURRENCY = 200
+
+
+def config(pool_size: int) -> Config:
+    return Config(connect=ConnectConfig(servers="nats://127.0.0.1:4222", pool_size=pool_size))
+
+
+async def run(pool_size: int) -> float:
+    app = NatsAPI("bench", client_config=config(pool_size))
+
+    @app.request("echo", include_schema=False)
+    async def echo(app, data: str):
+        return {"size": len(data)}
+
+    await app.startup(loop=asyncio.get_running_loop())
+    nc = await NatsClient.connect_standalone(config(pool_size))
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    params = {"data": "x" * PAYLOAD_BYTES}
+
+    async def one():
+        async with semaphore:
+            await nc.request("bench.echo", params, timeout=10)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(N)])
+    elapsed = time.perf_counter() - started
+    await nc.shutdown()
+    await app.shutdown()
+    return elapsed
+
+
+async def main():
+    for pool_size in (1, 2, 4, 8):
+        elapsed = await run(pool_size)
+        print(
+            f"pool_size={pool_size}: {N} requests of {PAYLOAD_BYTES} bytes in {elapsed:.2f}s, {N / elapsed:.0f} req/s",
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
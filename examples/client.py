@@ -1,14 +1,13 @@
 import asyncio
 
-from natsapi import NatsAPI
+from natsapi.client import NatsClient
 
 
 async def main():
-    app = await NatsAPI("client").startup()
-
-    params = {"person": {"first_name": "Foo", "last_name": "Bar"}}
-    r = await app.nc.request("natsapi.persons.greet", params=params, timeout=5)
-    print(r.result)
+    async with await NatsClient.connect_standalone() as nc:
+        params = {"person": {"first_name": "Foo", "last_name": "Bar"}}
+        r = await nc.request("natsapi.persons.greet", params=params, timeout=5)
+        print(r.result)
 
 
 asyncio.run(main())
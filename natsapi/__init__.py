@@ -1,6 +1,17 @@
 from .applications import NatsAPI
 from .exceptions import JsonRPCException
-from .models import JsonRPCReply, JsonRPCRequest
+from .models import JsonRPCReply, JsonRPCRequest, RawResult
+from .params import Depends
 from .routing import Pub, Sub, SubjectRouter
 
-__all__ = ["NatsAPI", "JsonRPCException", "Pub", "Sub", "SubjectRouter", "JsonRPCRequest", "JsonRPCReply"]
+__all__ = [
+    "NatsAPI",
+    "JsonRPCException",
+    "Pub",
+    "Sub",
+    "SubjectRouter",
+    "JsonRPCRequest",
+    "JsonRPCReply",
+    "RawResult",
+    "Depends",
+]
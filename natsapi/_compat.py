@@ -112,6 +112,9 @@ if PYDANTIC_V2:
     def get_compat_model_name_map(fields: list[ModelField]):
         return {}
 
+    def parse_json(model: type[BaseModel], data: bytes | str) -> BaseModel:
+        return model.model_validate_json(data)
+
     def get_definitions(
         *,
         fields: list[ModelField],
@@ -178,6 +181,9 @@ else:
         models = get_flat_models_from_fields(fields, known_models=set())
         return get_model_name_map(models)  # type: ignore[no-any-return]
 
+    def parse_json(model: type[BaseModel], data: bytes | str) -> BaseModel:
+        return model.parse_raw(data)
+
     def get_model_definitions(
         *,
         flat_models: Union[set[type[BaseModel], type[Enum]]],
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from typing import Any
+
+from nats.aio.subscription import Subscription
+
+from natsapi.client.config import AdmissionConfig
+
+
+class AdmissionController:
+    """
+    Keeps track of how busy the instance is, so messages can be rejected before any work is done for them.
+    Rejected requests can then be picked up by other members of the queue group.
+    """
+
+    def __init__(self, config: AdmissionConfig, subscriptions: list[Subscription] | None = None):
+        self.config = config
+        self.subscriptions = subscriptions if subscriptions is not None else []
+        self.exempt_subjects = set(config.exempt_subjects)
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+        self.loop_lag = 0.0
+        self.rejected = 0
+        self._monitor: asyncio.Task | None = None
+
+    @property
+    def queued_bytes(self) -> int:
+        return self.in_flight_bytes + sum(sub.pending_bytes for sub in self.subscriptions)
+
+    def is_overloaded(self) -> bool:
+        cfg = self.config
+        return (
+            (cfg.max_loop_lag > 0 and self.loop_lag > cfg.max_loop_lag)
+            or (cfg.max_in_flight > 0 and self.in_flight >= cfg.max_in_flight)
+            or (cfg.max_queued_bytes > 0 and self.queued_bytes >= cfg.max_queued_bytes)
+        )
+
+    def is_exempt(self, route: Any) -> bool:
+        return route is not None and route.subject in self.exempt_subjects
+
+    def acquire(self, size: int) -> None:
+        self.in_flight += 1
+        self.in_flight_bytes += size
+
+    def release(self, size: int) -> None:
+        self.in_flight -= 1
+        self.in_flight_bytes -= size
+
+    def start(self) -> None:
+        if self.config.max_loop_lag > 0 and self._monitor is None:
+            self._monitor = asyncio.create_task(self._monitor_loop_lag(), name="admission_loop_lag")
+
+    async def stop(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+
+    async def _monitor_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = self.config.loop_lag_interval
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            # A stall keeps counting for about as long as it lasted, so a single sample doesn't end it
+            lag = max(0.0, loop.time() - started - interval)
+            self.loop_lag = max(lag, self.loop_lag - interval)
+            if self.loop_lag > self.config.max_loop_lag:
+                logging.warning(f"Event loop lags {self.loop_lag:.3f}s behind, rejecting incoming messages")
@@ -10,13 +10,22 @@ from natsapi.asyncapi import Errors, ExternalDocumentation
 from natsapi.asyncapi.models import AsyncAPI
 from natsapi.asyncapi.utils import get_asyncapi
 from natsapi.client import Config, NatsClient
+from natsapi.client.breaker import CircuitBreakers
+from natsapi.client.cache import ReplyCache
 from natsapi.client.config import default_config
+from natsapi.client.hedging import Hedging
+from natsapi.client.reply_stats import ReplyBatchStats
+from natsapi.client.retry import RetryPolicy
 from natsapi.exception_handlers import handle_internal_error, handle_jsonrpc_exception, handle_validation_error
 from natsapi.exceptions import DuplicateRouteException, JsonRPCException
+from natsapi.idempotency import Idempotency
+from natsapi.limits import Limit, RateLimit
 from natsapi.logger import logger
-from natsapi.routing import Pub, Publish, Request, Sub, SubjectRouter
+from natsapi.middleware import Middleware
+from natsapi.routing import Pub, Publish, RawRequest, Request, Sub, SubjectRouter
+from natsapi.scheduling import Scheduler
 from natsapi.state import State
-from natsapi.types import DecoratedCallable
+from natsapi.types import DecoratedCallable, Priority
 
 
 class NatsAPI:
@@ -35,12 +44,32 @@ class NatsAPI:
         servers: dict[str, Union[str, Any]] | None = None,
         domain_errors: dict[str, Any] | None = None,
         external_docs: dict[str, Any] | None = None,
+        local_dispatch: bool = False,
+        middleware: list[Middleware] | None = None,
+        concurrency_limit: Limit | None = None,
+        scheduler: Scheduler | None = None,
+        request_ids: Callable[[], str] | None = None,
+        hedging: Hedging | None = None,
+        retry: RetryPolicy | None = None,
+        breakers: CircuitBreakers | None = None,
+        cache: ReplyCache | None = None,
+        reply_batch_stats: ReplyBatchStats | None = None,
     ):
         """
         Parameters
         ----------
         root_path: str The path that every application-specific subject
         app: FastAPI Must be a FastAPI instance or None. If none the app is the NatsAPI instance itself
+        local_dispatch: bool Requests and publishes on `app.nc` to routes of this app are handled in-process
+        middleware: list Middleware wrapped around the dispatch of every request and publish, see `add_middleware`
+        concurrency_limit: Limit Adaptive limit on the messages handled at the same time, over all routes
+        scheduler: Scheduler Decides in which order messages are handled, e.g. fairly between tenants or by priority
+        request_ids: Callable Generates the ids of requests and publishes sent by `app.nc`, UUIDs or formatted as one
+        hedging: Hedging Sends requests of `app.nc` a second time when their reply takes long
+        retry: RetryPolicy Retries requests of `app.nc` that failed
+        breakers: CircuitBreakers Fail requests of `app.nc` right away while the service behind them seems down
+        cache: ReplyCache Answers repeated requests of `app.nc` with a reply that was kept
+        reply_batch_stats: ReplyBatchStats Reports how the replies of this app end up batched onto the socket
         """
         self.routes: dict[str, Request] = {}
         self.root_path = root_path
@@ -62,6 +91,16 @@ class NatsAPI:
         self._on_startup_method = None
         self._on_shutdown_method = None
         self.client_config = client_config or default_config
+        self.local_dispatch = local_dispatch
+        self.user_middleware: list[Middleware] = [] if middleware is None else list(middleware)
+        self.concurrency_limit = concurrency_limit
+        self.scheduler = scheduler
+        self.request_ids = request_ids
+        self.hedging = hedging
+        self.retry = retry
+        self.breakers = breakers
+        self.cache = cache
+        self.reply_batch_stats = reply_batch_stats
         self._exception_handlers: dict[type[Exception], Callable[[type[Exception]], JsonRPCException]] = (
             {} if exception_handlers is None else dict(exception_handlers)
         )
@@ -132,7 +171,7 @@ class NatsAPI:
         Adds default route to retrieve the asyncapi schema.
         """
 
-        @self.request("schema.RETRIEVE", result=AsyncAPI, include_schema=False)
+        @self.request("schema.RETRIEVE", result=AsyncAPI, include_schema=False, priority="control")
         def retrieve_asyncapi_schema(app):
             return self.generate_asyncapi()
 
@@ -154,6 +193,16 @@ class NatsAPI:
             app=self.app,
             config=self.client_config,
             exception_handlers=self._exception_handlers,
+            local_dispatch=self.local_dispatch,
+            middleware=self.user_middleware,
+            concurrency_limit=self.concurrency_limit,
+            scheduler=self.scheduler,
+            request_ids=self.request_ids,
+            hedging=self.hedging,
+            retry=self.retry,
+            breakers=self.breakers,
+            cache=self.cache,
+            reply_batch_stats=self.reply_batch_stats,
         )
         await self.nc.connect()
         logger.info("Connected to NATS server")
@@ -235,7 +284,14 @@ class NatsAPI:
         tags: list[str] | None = None,
         summary: str | None = None,
         suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        idempotency: Idempotency | None = None,
+        cache_ttl: float | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ) -> None:
         request = Request(
             subject=subject,
@@ -247,7 +303,14 @@ class NatsAPI:
             tags=tags,
             summary=summary,
             suggested_timeout=suggested_timeout,
+            enforce_timeout=enforce_timeout,
+            idempotency=idempotency,
+            cache_ttl=cache_ttl,
             include_schema=include_schema,
+            rate_limit=rate_limit,
+            concurrency_limit=concurrency_limit,
+            priority=priority,
+            max_payload=max_payload,
         )
         if self.rpc_methods:
             method = subject.split(".")[-1]
@@ -271,6 +334,10 @@ class NatsAPI:
         tags: list[str] | None = None,
         summary: str | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ) -> None:
         publish = Publish(
             subject=subject,
@@ -281,6 +348,10 @@ class NatsAPI:
             tags=tags,
             summary=summary,
             include_schema=include_schema,
+            rate_limit=rate_limit,
+            concurrency_limit=concurrency_limit,
+            priority=priority,
+            max_payload=max_payload,
         )
         if self.rpc_methods:
             method = subject.split(".")[-1]
@@ -304,7 +375,14 @@ class NatsAPI:
         tags: list[str] | None = None,
         summary: str | None = None,
         suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        idempotency: Idempotency | None = None,
+        cache_ttl: float | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ) -> Callable[[DecoratedCallable], DecoratedCallable]:
         def decorator(func: DecoratedCallable) -> DecoratedCallable:
             self.add_request(
@@ -317,7 +395,14 @@ class NatsAPI:
                 tags=tags,
                 summary=summary,
                 suggested_timeout=suggested_timeout,
+                enforce_timeout=enforce_timeout,
+                idempotency=idempotency,
+                cache_ttl=cache_ttl,
                 include_schema=include_schema,
+                rate_limit=rate_limit,
+                concurrency_limit=concurrency_limit,
+                priority=priority,
+                max_payload=max_payload,
             )
             return func
 
@@ -333,6 +418,10 @@ class NatsAPI:
         tags: list[str] | None = None,
         summary: str | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ) -> Callable[[DecoratedCallable], DecoratedCallable]:
         def decorator(func: DecoratedCallable) -> DecoratedCallable:
             self.add_publish(
@@ -344,6 +433,89 @@ class NatsAPI:
                 tags=tags,
                 summary=summary,
                 include_schema=include_schema,
+                rate_limit=rate_limit,
+                concurrency_limit=concurrency_limit,
+                priority=priority,
+                max_payload=max_payload,
+            )
+            return func
+
+        return decorator
+
+    def add_raw_request(
+        self,
+        subject: str,
+        endpoint: Callable[..., Any],
+        *,
+        description: str | None = None,
+        deprecated: bool | None = None,
+        tags: list[str] | None = None,
+        summary: str | None = None,
+        suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
+    ) -> None:
+        request = RawRequest(
+            subject=subject,
+            endpoint=endpoint,
+            description=description,
+            deprecated=deprecated,
+            tags=tags,
+            summary=summary,
+            suggested_timeout=suggested_timeout,
+            enforce_timeout=enforce_timeout,
+            include_schema=include_schema,
+            rate_limit=rate_limit,
+            concurrency_limit=concurrency_limit,
+            priority=priority,
+            max_payload=max_payload,
+        )
+        if self.rpc_methods:
+            method = subject.split(".")[-1]
+            assert (
+                method in self.rpc_methods
+            ), f"'{method}' is an invalid request method in handler '{endpoint.__name__}'. Allowed methods: {self.rpc_methods}"
+
+        key_name = ".".join([self.root_path, request.subject])
+        if key_name in self.routes:
+            raise DuplicateRouteException(f"{key_name} is defined twice!")
+        self.routes[key_name] = request
+
+    def raw_request(
+        self,
+        subject: str,
+        *,
+        description: str | None = None,
+        deprecated: bool | None = None,
+        tags: list[str] | None = None,
+        summary: str | None = None,
+        suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
+    ) -> Callable[[DecoratedCallable], DecoratedCallable]:
+        def decorator(func: DecoratedCallable) -> DecoratedCallable:
+            self.add_raw_request(
+                subject=subject,
+                endpoint=func,
+                description=description,
+                deprecated=deprecated,
+                tags=tags,
+                summary=summary,
+                suggested_timeout=suggested_timeout,
+                enforce_timeout=enforce_timeout,
+                include_schema=include_schema,
+                rate_limit=rate_limit,
+                concurrency_limit=concurrency_limit,
+                priority=priority,
+                max_payload=max_payload,
             )
             return func
 
@@ -449,6 +621,14 @@ class NatsAPI:
         for pub in pubs:
             self.pubs.add(pub)
 
+    def add_middleware(self, middleware_class: type, **options: Any) -> None:
+        """
+        The middleware stack is composed on startup, the last middleware added is the outermost one.
+        """
+        if self.nc is not None:
+            raise RuntimeError("Cannot add middleware after an application has started")
+        self.user_middleware.insert(0, Middleware(middleware_class, **options))
+
     def add_exception_handler(
         self,
         exc_class: type[Exception],
@@ -17,7 +17,7 @@ from natsapi._compat import (
 from natsapi.asyncapi.constants import REF_PREFIX, REF_TEMPLATE
 from natsapi.encoders import jsonable_encoder
 from natsapi.models import JsonRPCError
-from natsapi.routing import Pub, Publish, Request, Sub
+from natsapi.routing import Pub, Publish, RawRequest, Request, Sub
 
 from . import Errors, ExternalDocumentation, Server
 from .models import AsyncAPI
@@ -118,6 +118,17 @@ def generate_asyncapi_publish_channel(operation: Publish, model_name_map: dict[s
     return {"publish": operation_schema, "deprecated": operation.deprecated}
 
 
+def generate_asyncapi_raw_request_channel(operation: RawRequest) -> Any:
+    binary = {"contentType": "application/octet-stream", "payload": {"type": "string", "format": "binary"}}
+    failed_reply = {"contentType": "application/json", "payload": {"$ref": REF_PREFIX + JsonRPCError.__name__}}
+
+    operation_schema = get_asyncapi_request_operation_metadata(operation)
+    operation_schema["message"] = binary
+    operation_schema["replies"] = [binary, failed_reply]
+    operation_schema["tags"] = [{"name": tag} for tag in operation.tags]
+    return {"request": operation_schema, "deprecated": operation.deprecated}
+
+
 def domain_errors_schema(lower_bound: int, upper_bound: int, exceptions: list[Exception]):
     schema = {}
     schema["range"] = {"upper": upper_bound, "lower": lower_bound}
@@ -214,6 +225,8 @@ def get_asyncapi(
         elif getattr(endpoint, "include_schema", None) and isinstance(endpoint, Publish):
             result = generate_asyncapi_publish_channel(endpoint, model_name_map)
             subjects[subject] = result
+        elif getattr(endpoint, "include_schema", None) and isinstance(endpoint, RawRequest):
+            subjects[subject] = generate_asyncapi_raw_request_channel(endpoint)
 
     for sub in subs:
         channel, operation = get_sub_operation_schema(sub)
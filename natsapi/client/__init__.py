@@ -1,4 +1,22 @@
+from .breaker import CircuitBreakers, subject_prefix
+from .cache import ReplyCache
 from .client import NatsClient
-from .config import Config, ConnectConfig, SubscribeConfig
+from .config import AdmissionConfig, Config, ConnectConfig, SubscribeConfig
+from .hedging import Hedging
+from .reply_stats import ReplyBatchStats
+from .retry import RetryBudget, RetryPolicy
 
-__all__ = ["NatsClient", "Config", "SubscribeConfig", "ConnectConfig"]
+__all__ = [
+    "NatsClient",
+    "Config",
+    "SubscribeConfig",
+    "ConnectConfig",
+    "AdmissionConfig",
+    "Hedging",
+    "RetryPolicy",
+    "RetryBudget",
+    "CircuitBreakers",
+    "subject_prefix",
+    "ReplyCache",
+    "ReplyBatchStats",
+]
@@ -0,0 +1,153 @@
+import time
+from collections.abc import Callable
+from typing import Any, Literal
+
+from nats import errors
+
+from natsapi.exceptions import CircuitOpenError
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+def subject_prefix(depth: int) -> Callable[[str], str]:
+    """
+    One breaker for all subjects that start with the same `depth` tokens, e.g. per service instead of per endpoint.
+    """
+
+    def key(subject: str) -> str:
+        return ".".join(subject.split(".")[:depth])
+
+    return key
+
+
+class CircuitBreaker:
+    """
+    State of the circuit of a single key, see `CircuitBreakers`.
+    """
+
+    def __init__(self, key: str, breakers: "CircuitBreakers"):
+        self.key = key
+        self.breakers = breakers
+        self.state: CircuitState = "closed"
+        self.requests = 0
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self.probes = 0
+        self._window_start = time.monotonic()
+        self._opened_at = 0.0
+
+    def before_request(self) -> bool:
+        """
+        Raises `CircuitOpenError` when the request shouldn't be sent, returns whether the request is a probe.
+        """
+        if self.state == "closed":
+            return False
+        retry_after = self._opened_at + self.breakers.open_for - time.monotonic()
+        if self.state == "open" and retry_after <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and self.probes < self.breakers.half_open_probes:
+            self.probes += 1
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(self.key, max(retry_after, 0.0))
+
+    def record(self, failed: bool, probe: bool) -> None:
+        if probe:
+            self.probes -= 1
+            if self.state == "half_open" and failed:
+                self._open()
+            elif self.state == "half_open":
+                self._close()
+            return
+        if self.state != "closed":
+            return
+
+        now = time.monotonic()
+        if now - self._window_start > self.breakers.window:
+            self._window_start = now
+            self.requests = self.failures = 0
+        self.requests += 1
+        self.failures += failed
+        if self.requests >= self.breakers.min_requests and self.failures / self.requests >= self.breakers.failure_ratio:
+            self._open()
+
+    def release(self, probe: bool) -> None:
+        """
+        Gives up a request without an outcome, e.g. when it was cancelled.
+        """
+        if probe:
+            self.probes -= 1
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.opened += 1
+        self._opened_at = time.monotonic()
+
+    def _close(self) -> None:
+        self.state = "closed"
+        self._window_start = time.monotonic()
+        self.requests = self.failures = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreakers:
+    """
+    Fails requests right away with `CircuitOpenError` while the service behind their subject seems to be down,
+    instead of letting every request wait for its timeout.
+
+    Requests that time out, have no responders or get a reply with one of the `failure_codes` count as failures.
+    A circuit opens when at least `failure_ratio` of at least `min_requests` requests in a `window` of seconds failed.
+    After `open_for` seconds up to `half_open_probes` requests are let through: the circuit closes again when they
+    succeed, and opens again when they fail.
+
+    key: which breaker a subject belongs to, its own by default, see `subject_prefix`
+    """
+
+    def __init__(
+        self,
+        *,
+        key: Callable[[str], str] | None = None,
+        failure_ratio: float = 0.5,
+        min_requests: int = 10,
+        window: float = 10.0,
+        open_for: float = 5.0,
+        half_open_probes: int = 1,
+        failure_on: tuple[type[Exception], ...] = (errors.TimeoutError, errors.NoRespondersError),
+        # SERVICE_OVERLOADED, REQUEST_TIMEOUT and internal errors, also those of unhandled exceptions
+        failure_codes: tuple[int, ...] = (-32000, -32002, -32603, -40000),
+    ):
+        assert 0 < failure_ratio <= 1, "Expected 0 < failure_ratio <= 1"
+        assert min_requests >= 1, "Expected min_requests >= 1"
+        assert half_open_probes >= 1, "Expected half_open_probes >= 1"
+        self.key = key
+        self.failure_ratio = failure_ratio
+        self.min_requests = min_requests
+        self.window = window
+        self.open_for = open_for
+        self.half_open_probes = half_open_probes
+        self.failure_on = failure_on
+        self.failure_codes = set(failure_codes)
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(self, subject: str) -> CircuitBreaker:
+        key = subject if self.key is None else self.key(subject)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(key, self)
+        return breaker
+
+    def is_failure(self, reply: Any) -> bool:
+        error = getattr(reply, "error", None)
+        return error is not None and error.code in self.failure_codes
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {key: breaker.stats() for key, breaker in self.breakers.items()}
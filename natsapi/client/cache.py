@@ -0,0 +1,118 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+
+from nats.aio.client import Client as NATS
+from nats.aio.msg import Msg
+from nats.aio.subscription import Subscription
+
+from natsapi.encoders import jsonable_encoder
+
+DEFAULT_INVALIDATION_SUBJECT = "natsapi.cache.invalidate"
+
+_key_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), default=jsonable_encoder)
+
+
+class ReplyCache:
+    """
+    Keeps replies to requests with the same subject, params and headers, to answer repeated requests locally.
+
+    A reply is only kept when it succeeded and has a TTL: the `cache_ttl` of the request, or the one the route
+    put in the `Jsonrpc-Cache-Ttl` header of its reply. Up to `max_entries` replies, taking up to `max_bytes`,
+    of which the least recently used are evicted first.
+
+    Entries of a subject are dropped early when it's published on `invalidation_subject`, see
+    `NatsClient.invalidate_cache`. An empty message drops all entries.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        invalidation_subject: str | None = DEFAULT_INVALIDATION_SUBJECT,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.invalidation_subject = invalidation_subject
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.bytes = 0
+        self._entries: OrderedDict[tuple, tuple[float, Msg]] = OrderedDict()
+        self._keys_by_subject: dict[str, set[tuple]] = {}
+        self._subscription: Subscription | None = None
+
+    @staticmethod
+    def key(subject: str, params: dict[str, Any], headers: dict | None, header_envelope: bool) -> tuple:
+        encoded_headers = _key_encoder.encode(headers) if headers else None
+        return subject, header_envelope, _key_encoder.encode(params), encoded_headers
+
+    def get(self, key: tuple) -> Msg | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: tuple, msg: Msg, ttl: float) -> None:
+        if ttl <= 0 or len(msg.data) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = time.monotonic() + ttl, msg
+        self._keys_by_subject.setdefault(key[0], set()).add(key)
+        self.bytes += len(msg.data)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, subject: str | None = None) -> None:
+        """
+        Drops the entries of `subject`, or all of them.
+        """
+        self.invalidations += 1
+        if subject is None:
+            self._entries.clear()
+            self._keys_by_subject.clear()
+            self.bytes = 0
+            return
+        for key in list(self._keys_by_subject.get(subject, ())):
+            self._remove(key)
+
+    def _remove(self, key: tuple) -> None:
+        _, msg = self._entries.pop(key)
+        self.bytes -= len(msg.data)
+        keys = self._keys_by_subject[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_subject[key[0]]
+
+    async def start(self, nats: NATS) -> None:
+        if self.invalidation_subject is not None:
+            self._subscription = await nats.subscribe(self.invalidation_subject, cb=self._on_invalidation)
+
+    async def _on_invalidation(self, msg: Msg) -> None:
+        self.invalidate(msg.data.decode() or None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
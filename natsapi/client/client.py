@@ -3,19 +3,90 @@ import inspect
 import json
 import logging
 import secrets
-from collections.abc import Callable
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from contextlib import AsyncExitStack
+from functools import partial
+from itertools import repeat
 from ssl import create_default_context
 from typing import Any
-from uuid import uuid4
+from uuid import UUID, uuid4
 
+from nats import errors
+from nats.aio.client import NO_RESPONDERS_STATUS
 from nats.aio.client import Client as NATS
+from nats.aio.msg import Msg
+from nats.js.api import Header
+from pydantic import BaseModel, ValidationError
 
+from natsapi._compat import parse_json
+from natsapi.admission import AdmissionController
 from natsapi.context import CTX_JSONRPC_ID
-from natsapi.exceptions import JsonRPCException, JsonRPCUnknownMethodException
-from natsapi.models import JsonRPCError, JsonRPCReply, JsonRPCRequest
-from natsapi.routing import Request
+from natsapi.dependencies import DependencyResolver
+from natsapi.exception_handlers import handle_jsonrpc_exception
+from natsapi.exceptions import (
+    JsonRPCException,
+    JsonRPCInternalErrorException,
+    JsonRPCPayloadTooLargeException,
+    JsonRPCRateLimitedException,
+    JsonRPCRequestTimeoutException,
+    JsonRPCServiceOverloadedException,
+    JsonRPCUnknownMethodException,
+)
+from natsapi.limits import Limit
+from natsapi.middleware import Dispatch, Middleware, Scope
+from natsapi.models import (
+    CACHE_TTL_HEADER,
+    ERROR_CODE_HEADER,
+    ERROR_MESSAGE_HEADER,
+    ID_HEADER,
+    METHOD_HEADER,
+    TIMEOUT_HEADER,
+    JsonRPCError,
+    JsonRPCReply,
+    JsonRPCRequest,
+    LazyReply,
+    PreEncodedErrorReply,
+    RawReply,
+    RawResult,
+    RawResultReply,
+    RequestIds,
+    encode_json,
+    encode_request,
+)
+from natsapi.routing import Publish, RawRequest, Request
+from natsapi.scheduling import Scheduler
 
+from .breaker import CircuitBreakers
+from .cache import DEFAULT_INVALIDATION_SUBJECT, ReplyCache
 from .config import Config, default_config
+from .hedging import Hedging
+from .reply_stats import ReplyBatchStats
+from .retry import RetryPolicy
+
+
+def _is_uuid(value: Any) -> bool:
+    try:
+        UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+try:
+    # The header names nats-py accepts, so publish_many rejects a batch up front instead of halfway
+    from nats.aio.client import _HEADER_KEY_RE as _HEADER_KEY
+except ImportError:  # pragma: no cover
+    # Older nats-py releases publish any header name
+    _HEADER_KEY = None
+
+
+def _publish_size(subject: str, payload: bytes, headers: dict[str, str] | None) -> int:
+    """
+    Upper bound of the bytes a publish adds to the pending buffer of a connection.
+    """
+    header_size = sum(len(key) + len(value) + 4 for key, value in headers.items()) + 12 if headers else 0
+    return len(subject) + len(payload) + header_size + 32
 
 
 class NatsClient:
@@ -25,34 +96,233 @@ class NatsClient:
         app: Any = None,
         config: Config | None = None,
         exception_handlers: dict[type[Exception], Callable[[type[Exception]], JsonRPCException]] | None = None,
+        local_dispatch: bool = False,
+        middleware: list[Middleware] | None = None,
+        concurrency_limit: Limit | None = None,
+        scheduler: Scheduler | None = None,
+        request_ids: Callable[[], str] | None = None,
+        hedging: Hedging | None = None,
+        retry: RetryPolicy | None = None,
+        breakers: CircuitBreakers | None = None,
+        cache: ReplyCache | None = None,
+        reply_batch_stats: ReplyBatchStats | None = None,
     ) -> None:
+        """
+        local_dispatch: when the subject of a request or publish is a route of this client, call the endpoint
+        in-process instead of going over NATS. Params are handed over as-is, so no JSON encoding takes place.
+        middleware: wrapped around the dispatch of every request and publish, first in the list is outermost.
+        concurrency_limit: shared by all routes, on top of the concurrency limit of a route itself.
+        scheduler: decides in which order incoming messages are handled, instead of first-come first-served.
+        request_ids: generates the ids of outgoing requests and publishes, `RequestIds` by default. The ids must be
+        UUIDs or strings formatted as one, the JSON-RPC envelope types its id as a UUID.
+        hedging: sends requests a second time when the reply takes long, unless `request` gets a policy of its own.
+        retry: retries requests that failed, unless `request` gets a policy of its own.
+        breakers: fail requests right away while the service behind their subject seems to be down.
+        cache: answers repeated requests with a reply that was kept, see `ReplyCache`.
+        reply_batch_stats: keeps track of how many replies are written to the socket together.
+        """
         self.routes = routes
         self.app = app
         self.config = config or default_config
         self._exception_handlers = exception_handlers
+        self.local_dispatch = local_dispatch
+        self._middleware_stack = self._build_middleware_stack(middleware or [])
+        self.concurrency_limit = concurrency_limit
+        self.scheduler = scheduler
+        if request_ids is not None:
+            assert _is_uuid(request_ids()), "Expected request_ids to generate UUIDs or strings formatted as one"
+        self.request_ids = request_ids or RequestIds()
+        self.hedging = hedging
+        self.retry = retry
+        self.breakers = breakers
+        self.cache = cache
+        self.reply_batch_stats = reply_batch_stats
+        self.dependencies = DependencyResolver(app)
+        self.subscriptions = []
+        self.admission = None
+        if self.config.admission.enabled:
+            self.admission = AdmissionController(self.config.admission, self.subscriptions)
+        self._overloaded_reply = PreEncodedErrorReply(JsonRPCServiceOverloadedException())
+        self._unknown_reply = PreEncodedErrorReply(JsonRPCUnknownMethodException())
+        self._too_large_reply = PreEncodedErrorReply(JsonRPCPayloadTooLargeException())
+        self._internal_reply = PreEncodedErrorReply(JsonRPCInternalErrorException())
+        self._legacy_subjects: set[str] = set()
+        self._legacy_subjects_for = -1
         self.nats = NATS()
+        self.pool: list[NATS] = [self.nats]
+        self._next_connection = 0
+        self._pool_queue = "natsapi_pool_" + secrets.token_hex(8)
+
+    @classmethod
+    async def connect_standalone(cls, config: Config | None = None, **kwargs) -> "NatsClient":
+        """
+        A client that only sends requests and publishes, for CLI tools, lambdas and tests that don't serve routes.
+        Nothing is subscribed, no signal handlers are registered and there is no schema. No TLS context is made
+        either, unless the config has one: nats-py makes one itself for tls:// servers.
+
+        kwargs: passed on to `NatsClient`, e.g. `retry` or `cache`
+
+        ```
+        async with await NatsClient.connect_standalone(Config(connect=ConnectConfig(servers=...))) as nc:
+            reply = await nc.request("natsapi.persons.greet", params)
+        ```
+        """
+        client = cls({}, config=config, **kwargs)
+        await client.connect(default_tls=False)
+        return client
 
-    async def connect(self) -> None:
+    async def __aenter__(self) -> "NatsClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.shutdown()
+
+    async def connect(self, default_tls: bool = True) -> None:
+        """
+        default_tls: use the default SSL context when the config has no TLS context of its own
+        """
         cfg = self.config.connect
         cfg.error_cb = cfg.error_cb or self._error_cb
         cfg.closed_cb = cfg.closed_cb or self._closed_cb
         cfg.reconnected_cb = cfg.reconnected_cb or self._reconnected_cb
-        cfg.tls = cfg.tls or create_default_context()
+        if default_tls:
+            cfg.tls = cfg.tls or create_default_context()
 
-        await self.nats.connect(**(cfg.dict()))
+        assert cfg.pool_size >= 1, "Expected pool_size >= 1"
+        self.pool = [self.nats, *(NATS() for _ in range(cfg.pool_size - 1))]
+        options = cfg.dict(exclude={"pool_size"})
+        await asyncio.gather(*[nats.connect(**options) for nats in self.pool])
+        if self.admission is not None:
+            self.admission.start()
+        if self.cache is not None:
+            await self.cache.start(self.nats)
 
     async def root_path_subscribe(self, subject: str, cb: Callable, queue: str = ""):
-        await self.nats.subscribe(subject, cb=cb, **(self.config.subscribe.dict()))
+        options = self.config.subscribe.dict()
+        if len(self.pool) > 1 and not options["queue"]:
+            # Each message should be handled once by the pool, instead of once per connection
+            options["queue"] = self._pool_queue
+        for nats in self.pool:
+            sub = await nats.subscribe(subject, cb=cb, **options)
+            self.subscriptions.append(sub)
+
+    def connection(self, subject: str | None = None) -> NATS:
+        """
+        Connection of the pool to send on. Publishes to the same subject always take the same one to stay in order,
+        other messages take the connections in turn.
+        """
+        if len(self.pool) == 1:
+            return self.nats
+        if subject is not None:
+            return self.pool[hash(subject) % len(self.pool)]
+        self._next_connection = (self._next_connection + 1) % len(self.pool)
+        return self.pool[self._next_connection]
+
+    def pool_stats(self) -> list[dict[str, Any]]:
+        """
+        Traffic of every connection of the pool, with the bytes waiting to be flushed.
+        """
+        return [
+            {
+                "connected": nats.is_connected,
+                "pending_bytes": nats.pending_data_size,
+                **nats.stats,
+            }
+            for nats in self.pool
+        ]
+
+    async def publish(
+        self,
+        subject: str,
+        params: dict[str, Any],
+        method: str = None,
+        reply=None,
+        headers: dict = None,
+        header_envelope: bool = False,
+    ):
+        """
+        method: legacy attribute, used for backwards compatibility
+        header_envelope: send the id and method as NATS headers and just the params as body
+        """
+        if self.local_dispatch and not reply and (route := self._resolve_route(subject, method)):
+            asyncio.create_task(self._publish_local(subject, route, params), name="natsapi_" + secrets.token_hex(16))
+            return
+        if header_envelope:
+            headers = self._envelope_headers(headers, method, None)
+            payload = encode_json(params)
+            await self.connection(subject).publish(subject, payload, reply=reply, headers=headers)
+            return
+        payload = encode_request(params, id=self.request_ids(), method=method, timeout=-1)
+        await self.connection(subject).publish(subject, payload, reply=reply, headers=headers)
 
-    async def publish(self, subject: str, params: dict[str, Any], method: str = None, reply=None, headers: dict = None):
+    async def publish_many(
+        self,
+        subject_or_pairs: str | Iterable[tuple[str, dict[str, Any]]],
+        payloads: Iterable[dict[str, Any]] | None = None,
+        method: str = None,
+        headers: dict = None,
+        flush: bool = False,
+    ) -> int:
         """
+        Publishes a batch of messages, which nats-py's flusher writes to the socket together.
+        Takes a subject with the params of every message, or pairs of subject and params.
+        Every subject, header, payload size and connection, including the room left in the pending buffer of a
+        connection that is reconnecting, is checked before anything is published or dispatched locally,
+        so a bad message rejects the whole batch. Returns how many messages were published.
+
         method: legacy attribute, used for backwards compatibility
+        headers: NATS headers of every message
+        flush: wait until the server received all of them
         """
-        json_rpc_payload = JsonRPCRequest(id=uuid4(), params=params, method=method, timeout=-1)
-        await self.nats.publish(subject, json_rpc_payload.json().encode(), reply=reply, headers=headers)
+        if isinstance(subject_or_pairs, str):
+            assert payloads is not None, "Expected payloads to publish on the subject"
+            pairs = zip(repeat(subject_or_pairs), payloads)
+        else:
+            assert payloads is None, "Expected either a subject with payloads, or pairs of subject and payload"
+            pairs = subject_or_pairs
+
+        for key in headers or {}:
+            if _HEADER_KEY is not None and key.strip() and not _HEADER_KEY.fullmatch(key.strip()):
+                raise errors.BadHeaderError(key)
+        local, remote = [], []
+        pending: dict[NATS, int] = {}
+        for subject, params in pairs:
+            if self.local_dispatch and (route := self._resolve_route(subject, method)):
+                local.append((subject, route, params))
+                continue
+            if not subject or any(c.isspace() for c in subject):
+                raise errors.BadSubjectError
+            nats = self.connection(subject)
+            if nats.is_closed:
+                raise errors.ConnectionClosedError
+            if nats.is_draining_pubs:
+                raise errors.ConnectionDrainingError
+            payload = encode_request(params, id=self.request_ids(), method=method, timeout=-1)
+            if len(payload) > nats.max_payload:
+                raise errors.MaxPayloadError
+            if not nats.is_connected:
+                # While reconnecting, publishes are buffered until the pending buffer is full
+                buffered = pending.get(nats, nats.pending_data_size)
+                max_pending = self.config.connect.pending_size
+                if max_pending <= 0 or buffered + len(payload) > max_pending:
+                    raise errors.OutboundBufferLimitError
+                pending[nats] = buffered + _publish_size(subject, payload, headers)
+            remote.append((nats, subject, payload))
+
+        for subject, route, params in local:
+            asyncio.create_task(self._publish_local(subject, route, params), name="natsapi_" + secrets.token_hex(16))
+        # No publish gives way to the event loop, so the flusher finds them all pending at once
+        for nats, subject, payload in remote:
+            await nats.publish(subject, payload, headers=headers)
+        if flush:
+            await asyncio.gather(*[nats.flush() for nats in {nats for nats, _, _ in remote}])
+        return len(local) + len(remote)
 
-    async def publish_on_reply(self, subject, payload):
-        await self.nats.publish(subject, payload)
+    async def publish_on_reply(self, subject, payload, headers: dict[str, str] | None = None):
+        if self.reply_batch_stats is not None:
+            await self.reply_batch_stats.write(self.connection(), subject, payload, headers)
+            return
+        await self.connection().publish(subject, payload, headers=headers)
 
     async def request(
         self,
@@ -61,24 +331,369 @@ class NatsClient:
         timeout=60,
         method: str = None,
         headers: dict = None,
-    ) -> JsonRPCReply:
+        header_envelope: bool = False,
+        result_model: type[BaseModel] | None = None,
+        raw: bool = False,
+        lazy: bool = False,
+        hedging: Hedging | None = None,
+        retry: RetryPolicy | None = None,
+        cache_ttl: float | None = None,
+    ) -> JsonRPCReply | LazyReply | Msg:
         """
         method: legacy attribute, used for backwards compatibility
+        header_envelope: send the id, timeout and method as NATS headers and just the params as body,
+        the server replies with just the result as body
+        result_model: the result is validated into this model straight from the reply, instead of into a dict
+        raw: return the reply message as received, without decoding it. Always goes over NATS
+        lazy: return a `LazyReply`, which is only decoded when its result or error is accessed
+        hedging: hedge policy for this request, instead of the one of the client
+        retry: retry policy for this request, instead of the one of the client
+        cache_ttl: seconds the reply cache of the client may keep the reply, instead of the TTL the route sent
         """
-        json_rpc_payload = JsonRPCRequest(params=params, method=method, timeout=timeout)
-        reply_raw = await self.nats.request(subject, json_rpc_payload.json().encode(), timeout, headers=headers)
-        reply = JsonRPCReply.parse_raw(reply_raw.data)
+        if self.local_dispatch and not raw and (route := self._resolve_route(subject, method)):
+            reply = await self._request_local(subject, route, params, timeout, method)
+            if result_model is not None and reply.error is None:
+                reply = JsonRPCReply.with_result(result_model).construct(
+                    jsonrpc=reply.jsonrpc,
+                    id=reply.id,
+                    result=result_model.parse_obj(reply.result),
+                    error=None,
+                )
+            if lazy:
+                # Already decoded, but the caller gets the same type as from a reply over NATS
+                return LazyReply(reply.encode(), None, lambda: reply)
+            return reply
+        parse = self._parse_header_reply if header_envelope else self._parse_reply
+        if raw:
+            decode = None
+        elif lazy:
+            decode = partial(self._lazy_reply, parse, result_model=result_model)
+        else:
+            decode = partial(parse, result_model=result_model)
+        if self.cache is not None:
+            # Keyed by the headers of the caller, the envelope headers carry an id of their own for every call
+            cache_subject = ".".join([subject, method]) if method else subject
+            cache_key = self.cache.key(cache_subject, params, headers, header_envelope)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached if decode is None else decode(cached)
+            decode = partial(self._cache_reply, cache_key, cache_ttl, header_envelope, decode)
+        if header_envelope:
+            headers = self._envelope_headers(headers, method, timeout)
+            payload = encode_json(params)
+        else:
+            payload = encode_request(params, id=self.request_ids(), method=method, timeout=timeout)
+        send = partial(self._send_request, subject, payload, headers, hedging or self.hedging, decode)
+        retry = retry or self.retry
+        if retry is None:
+            return await send(timeout)
+        return await retry.run(send, timeout)
+
+    async def _send_request(
+        self,
+        subject: str,
+        payload: bytes,
+        headers: dict | None,
+        hedging: Hedging | None,
+        decode: Callable[[Msg], Any] | None,
+        timeout: float,
+    ) -> Any:
+        if self.breakers is None:
+            return await self._send_request_once(subject, payload, headers, hedging, decode, timeout)
+
+        breaker = self.breakers.breaker(subject)
+        probe = breaker.before_request()
+        try:
+            reply = await self._send_request_once(subject, payload, headers, hedging, decode, timeout)
+        except self.breakers.failure_on:
+            breaker.record(True, probe)
+            raise
+        except BaseException:
+            breaker.release(probe)
+            raise
+        breaker.record(self.breakers.is_failure(reply), probe)
         return reply
 
+    async def _send_request_once(
+        self,
+        subject: str,
+        payload: bytes,
+        headers: dict | None,
+        hedging: Hedging | None,
+        decode: Callable[[Msg], Any] | None,
+        timeout: float,
+    ) -> Any:
+        if hedging is None:
+            msg = await self.connection().request(subject, payload, timeout, headers=headers)
+        else:
+            msg = await hedging.request(self.connection(), subject, payload, timeout, headers)
+        return msg if decode is None else decode(msg)
+
+    def _cache_reply(
+        self,
+        key: tuple,
+        ttl: float | None,
+        header_envelope: bool,
+        decode: Callable[[Msg], Any] | None,
+        msg: Msg,
+    ) -> Any:
+        """
+        Decodes the reply and keeps it when it succeeded and has a TTL. Routes only send a TTL with successful
+        replies. Without one, a raw reply in the classic envelope isn't decoded to find out and isn't kept.
+        """
+        reply = msg if decode is None else decode(msg)
+        headers = msg.headers or {}
+        if CACHE_TTL_HEADER in headers:
+            succeeded = True
+            ttl = ttl if ttl is not None else float(headers[CACHE_TTL_HEADER])
+        elif ttl is None:
+            return reply
+        elif header_envelope:
+            succeeded = ERROR_CODE_HEADER not in headers
+        else:
+            succeeded = decode is not None and reply.error is None
+        if succeeded:
+            self.cache.set(key, msg, ttl)
+        return reply
+
+    async def invalidate_cache(
+        self,
+        subject: str | None = None,
+        invalidation_subject: str = DEFAULT_INVALIDATION_SUBJECT,
+    ):
+        """
+        Has the reply caches of all clients drop the replies of `subject`, or all of them.
+        """
+        await self.nats.publish(invalidation_subject, (subject or "").encode())
+
+    @staticmethod
+    def _lazy_reply(parse: Callable, msg: Msg, result_model: type[BaseModel] | None = None) -> LazyReply:
+        return LazyReply(msg.data, msg.headers, partial(parse, msg, result_model))
+
+    @staticmethod
+    def _parse_reply(msg: Msg, result_model: type[BaseModel] | None = None) -> JsonRPCReply:
+        if result_model is None:
+            return JsonRPCReply.parse_raw(msg.data)
+        return parse_json(JsonRPCReply.with_result(result_model), msg.data)
+
+    def _envelope_headers(self, headers: dict | None, method: str | None, timeout: float | None) -> dict[str, str]:
+        headers = {**(headers or {}), ID_HEADER: str(self.request_ids())}
+        if timeout is not None:
+            headers[TIMEOUT_HEADER] = str(timeout)
+        if method:
+            headers[METHOD_HEADER] = method
+        return headers
+
+    @staticmethod
+    def _parse_header_reply(msg: Msg, result_model: type[BaseModel] | None = None) -> JsonRPCReply:
+        headers = msg.headers or {}
+        if ERROR_CODE_HEADER in headers:
+            error = JsonRPCError.parse_raw(msg.data)
+            return JsonRPCReply.construct(jsonrpc="2.0", id=headers.get(ID_HEADER), result=None, error=error)
+        result = json.loads(msg.data) if result_model is None else parse_json(result_model, msg.data)
+        return JsonRPCReply.construct(jsonrpc="2.0", id=headers.get(ID_HEADER), result=result, error=None)
+
+    async def request_raw(
+        self,
+        subject: str,
+        data: bytes,
+        timeout: float = 60,
+        headers: dict[str, str] | None = None,
+    ) -> RawReply:
+        """
+        Request to a raw endpoint, `data` is sent as body as-is.
+        """
+        headers = self._envelope_headers(headers, None, timeout)
+        reply = await self.connection().request(subject, data, timeout, headers=headers)
+        return RawReply(reply.data, reply.headers)
+
+    async def request_all(
+        self,
+        subject: str,
+        params: dict[str, Any] = dict(),
+        timeout: float = 1,
+        max_replies: int | None = None,
+        early_stop: Callable[[JsonRPCReply], bool] | None = None,
+        method: str = None,
+        headers: dict = None,
+        result_model: type[BaseModel] | None = None,
+    ) -> list[JsonRPCReply]:
+        """
+        Sends the request once to every subscriber of `subject` and collects their replies, see `stream_replies`.
+        """
+        return [
+            reply
+            async for reply in self.stream_replies(
+                subject,
+                params,
+                timeout=timeout,
+                max_replies=max_replies,
+                early_stop=early_stop,
+                method=method,
+                headers=headers,
+                result_model=result_model,
+            )
+        ]
+
+    async def stream_replies(
+        self,
+        subject: str,
+        params: dict[str, Any] = dict(),
+        timeout: float = 1,
+        max_replies: int | None = None,
+        early_stop: Callable[[JsonRPCReply], bool] | None = None,
+        method: str = None,
+        headers: dict = None,
+        result_model: type[BaseModel] | None = None,
+    ) -> AsyncIterator[JsonRPCReply]:
+        """
+        Sends the request once to every subscriber of `subject` and yields their replies as they come in.
+        Always goes over NATS, there's no telling how many other subscribers there are. Replies that can't be
+        decoded are logged and skipped, without counting towards `max_replies`.
+
+        timeout: seconds to wait for replies in total, after which it stops without raising
+        max_replies: stop after this many replies
+        early_stop: stop after the first reply for which it returns True
+        """
+        inbox = self.nats.new_inbox()
+        sub = await self.nats.subscribe(inbox)
+        try:
+            payload = encode_request(params, id=self.request_ids(), method=method, timeout=timeout)
+            await self.nats.publish(subject, payload, reply=inbox, headers=headers)
+            deadline = time.monotonic() + timeout
+            received = 0
+            while max_replies is None or received < max_replies:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    msg = await sub.next_msg(timeout=remaining)
+                except errors.TimeoutError:
+                    break
+                if msg.headers and msg.headers.get(Header.STATUS) == NO_RESPONDERS_STATUS:
+                    break
+                try:
+                    reply = self._parse_reply(msg, result_model)
+                except (ValueError, ValidationError) as e:
+                    logging.warning(f"Skipped a reply on {subject} that can't be decoded: {e}")
+                    continue
+                received += 1
+                yield reply
+                if early_stop is not None and early_stop(reply):
+                    break
+        finally:
+            await sub.unsubscribe()
+
     async def handle_request(self, msg):
-        if msg.reply and msg.reply != "None":
-            asyncio.create_task(self._handle_request(msg), name="natsapi_" + secrets.token_hex(16))
+        received_at = time.perf_counter()
+        is_request = msg.reply and msg.reply != "None"
+
+        # Junk and oversized messages are turned away before any JSON is parsed for them
+        route = self.routes.get(msg.subject)
+        if route is None:
+            if not self._is_legacy_subject(msg.subject) and self._has_default_handler(self._unknown_reply):
+                await self._reject(msg, is_request, self._unknown_reply, "there is no such endpoint")
+                return
+        elif (
+            route.max_payload is not None
+            and len(msg.data) > route.max_payload
+            and self._has_default_handler(self._too_large_reply)
+        ):
+            await self._reject(msg, is_request, self._too_large_reply, "the payload is too large")
+            return
+
+        if isinstance(route, RawRequest):
+            handle = partial(self._handle_raw_request, msg, route, received_at)
+        else:
+            handle = partial(self._handle_request if is_request else self._handle_publish, msg, received_at)
+        if self.admission is None and self.scheduler is None:
+            asyncio.create_task(handle(), name="natsapi_" + secrets.token_hex(16))
+            return
+
+        if self.admission is not None:
+            admission = self.admission
+            if (
+                (is_request or admission.config.shed_publishes)
+                and admission.is_overloaded()
+                and not admission.is_exempt(route)
+            ):
+                admission.rejected += 1
+                await self._reject(msg, is_request, self._overloaded_reply, "the service is overloaded")
+                return
+
+            size = len(msg.data)
+            admission.acquire(size)
+            handle = partial(self._handle_admitted, handle, size)
+
+        if self.scheduler is None:
+            asyncio.create_task(handle(), name="natsapi_" + secrets.token_hex(16))
+        else:
+            self.scheduler.submit(msg, route, handle)
+
+    async def _reject(self, msg, is_request: bool, reply: PreEncodedErrorReply, reason: str):
+        if is_request and msg.headers and ID_HEADER in msg.headers:
+            headers = {**reply.headers, ID_HEADER: msg.headers[ID_HEADER]}
+            await self.publish_on_reply(msg.reply, reply.error_payload, headers=headers)
+        elif is_request:
+            await self.publish_on_reply(msg.reply, reply())
         else:
-            asyncio.create_task(self._handle_publish(msg), name="natsapi_" + secrets.token_hex(16))
+            logging.debug(f"Dropped publish on {msg.subject}, {reason}")
 
-    async def _handle_publish(self, msg):
-        request = JsonRPCRequest.parse_raw(msg.data)
-        request.id = request.id or uuid4()
+    def _has_default_handler(self, reply: PreEncodedErrorReply) -> bool:
+        """
+        A pre-encoded reply skips the exception handlers, only use it when no custom handler would kick in.
+        """
+        if self._exception_handlers is None:
+            return True
+        return self._lookup_exception_handler(reply.exc) in (handle_jsonrpc_exception, None)
+
+    def _is_legacy_subject(self, subject: str) -> bool:
+        """
+        Whether `subject` could still resolve to a route with the legacy `method` attribute of the payload.
+        """
+        if len(self.routes) != self._legacy_subjects_for:
+            self._legacy_subjects = {
+                ".".join(tokens[:i])
+                for tokens in (key.split(".") for key in self.routes)
+                for i in range(1, len(tokens))
+            }
+            self._legacy_subjects_for = len(self.routes)
+        return subject in self._legacy_subjects
+
+    async def _handle_admitted(self, handle: Callable[[], Awaitable[None]], size: int):
+        try:
+            await handle()
+        finally:
+            self.admission.release(size)
+
+    @staticmethod
+    def _parse_request(msg) -> JsonRPCRequest:
+        """
+        Reads the classic JSON-RPC envelope, or the header envelope when the id is in the headers.
+        """
+        headers = msg.headers
+        if not headers or ID_HEADER not in headers:
+            request = JsonRPCRequest.parse_raw(msg.data)
+            request.id = request.id or uuid4()
+            return request
+        try:
+            params = json.loads(msg.data) if msg.data else {}
+        except ValueError:
+            # Fails with the same validation error as invalid JSON in the classic envelope
+            JsonRPCRequest.parse_raw(msg.data)
+        if not isinstance(params, dict):
+            JsonRPCRequest.parse_obj({"params": params})
+        timeout = headers.get(TIMEOUT_HEADER)
+        return JsonRPCRequest.construct(
+            jsonrpc="2.0",
+            id=headers[ID_HEADER],
+            method=headers.get(METHOD_HEADER),
+            timeout=float(timeout) if timeout else None,
+            params=params,
+        )
+
+    async def _handle_publish(self, msg, received_at: float | None = None):
+        request = self._parse_request(msg)
 
         subject = msg.subject
 
@@ -91,17 +706,22 @@ class NatsClient:
         except KeyError as e:
             raise JsonRPCUnknownMethodException(data=f"No such endpoint available for {subject}") from e
 
-        handler = route.endpoint
-        params_model = route.params
-        params = request.params if route.skip_validation else vars(params_model.parse_obj(request.params))
+        await self._dispatch(
+            "publish",
+            subject,
+            route,
+            request,
+            data=msg.data,
+            headers=msg.headers,
+            received_at=received_at,
+        )
 
-        if inspect.iscoroutinefunction(handler):
-            await handler(app=self.app, **params)
-        else:
-            handler(self.app, **params)
+    async def _handle_request(self, msg, received_at: float | None = None):
+        if msg.headers and ID_HEADER in msg.headers:
+            return await self._handle_header_request(msg, received_at)
 
-    async def _handle_request(self, msg):
-        request = result = None
+        request = None
+        headers = None
         try:
             request = JsonRPCRequest.parse_raw(msg.data)
             request.id = request.id or uuid4()
@@ -118,33 +738,355 @@ class NatsClient:
             except KeyError as e:
                 raise JsonRPCUnknownMethodException(data=f"No such endpoint available. Checked for {subject}") from e
 
-            handler = route.endpoint
-            params_model = route.params
-            params = request.params if route.skip_validation else vars(params_model.parse_obj(request.params))
-
-            if inspect.iscoroutinefunction(handler):
-                result = await handler(app=self.app, **params)
+            reply = partial(self._reply, msg, subject, route, request, received_at)
+            idempotency = route.idempotency
+            key = idempotency.key(request, msg.headers) if idempotency is not None else None
+            if key is None:
+                json_rpc_reply = await reply()
+                payload = json_rpc_reply.encode()
+                if route.cache_ttl is not None and json_rpc_reply.error is None:
+                    headers = {CACHE_TTL_HEADER: str(route.cache_ttl)}
             else:
-                result = handler(self.app, **params)
-
-            if not isinstance(result, dict):
-                if hasattr(result, "dict"):
-                    result = result.dict()
-                elif hasattr(result, "json"):
-                    result = json.loads(result.json())
-
-            reply = JsonRPCReply(id=request.id, result=result)
+                payload = await idempotency.reply(":".join([subject, key]), self.nats, reply, id=request.id)
         except Exception as exc:
             if not request:
                 request = JsonRPCRequest(params={}, timeout=60)
-            exception_handler = self._lookup_exception_handler(exc)
-            if inspect.iscoroutinefunction(exception_handler):
-                error: JsonRPCError = await exception_handler(exc, request, msg.subject)
+            payload = (await self._error_reply(exc, request, msg.subject)).json().encode()
+        finally:
+            await self.publish_on_reply(msg.reply, payload, headers=headers)
+
+    async def _reply(
+        self,
+        msg,
+        subject: str,
+        route: Request,
+        request: JsonRPCRequest,
+        received_at: float | None,
+    ) -> JsonRPCReply | RawResultReply:
+        try:
+            result = await self._dispatch(
+                "request",
+                subject,
+                route,
+                request,
+                data=msg.data,
+                headers=msg.headers,
+                received_at=received_at,
+            )
+            if isinstance(result, RawResult):
+                return result.reply(request.id)
+            return JsonRPCReply(id=request.id, result=self._result_as_dict(result))
+        except Exception as exc:
+            return await self._error_reply(exc, request, msg.subject)
+
+    async def _handle_header_request(self, msg, received_at: float | None = None):
+        """
+        The body of the reply is just the result, or the error with its code and message in the headers as well.
+        """
+        request = None
+        # Replied when even the exception handlers fail
+        payload = self._internal_reply.error_payload
+        headers = {**self._internal_reply.headers, ID_HEADER: msg.headers[ID_HEADER]}
+        try:
+            request = self._parse_request(msg)
+            CTX_JSONRPC_ID.set(request.id)
+            subject = msg.subject
+
+            if subject not in self.routes and request.method:
+                subject = ".".join([subject, request.method])
+
+            try:
+                logging.debug(f"Handling: {subject}")
+                route: Request = self.routes[subject]
+            except KeyError as e:
+                raise JsonRPCUnknownMethodException(data=f"No such endpoint available. Checked for {subject}") from e
+
+            idempotency = route.idempotency
+            key = idempotency.key(request, msg.headers) if idempotency is not None else None
+            if key is None:
+                result = await self._dispatch(
+                    "request",
+                    subject,
+                    route,
+                    request,
+                    data=msg.data,
+                    headers=msg.headers,
+                    received_at=received_at,
+                )
+                payload = result.data if isinstance(result, RawResult) else encode_json(self._result_as_dict(result))
+                headers = {ID_HEADER: str(request.id)}
+                if route.cache_ttl is not None:
+                    headers[CACHE_TTL_HEADER] = str(route.cache_ttl)
             else:
-                error: JsonRPCError = exception_handler(exc, request, msg.subject)
-            reply = JsonRPCReply(id=request.id, error=error)
+                # Stored as a classic reply, so retries are deduplicated whichever envelope they use
+                reply = partial(self._reply, msg, subject, route, request, received_at)
+                stored = await idempotency.reply(":".join([subject, key]), self.nats, reply, id=request.id)
+                payload, headers = self._header_reply(JsonRPCReply.parse_raw(stored))
+        except Exception as exc:
+            if not request:
+                request = JsonRPCRequest.construct(
+                    jsonrpc="2.0",
+                    id=msg.headers[ID_HEADER],
+                    method=None,
+                    timeout=60,
+                    params={},
+                )
+            payload, headers = await self._header_error_reply(exc, request, msg.subject)
+        finally:
+            await self.publish_on_reply(msg.reply, payload, headers=headers)
+
+    @staticmethod
+    def _header_reply(reply: JsonRPCReply) -> tuple[bytes, dict[str, str]]:
+        headers = {ID_HEADER: str(reply.id)}
+        if reply.error is None:
+            return encode_json(reply.result), headers
+        headers[ERROR_CODE_HEADER] = str(reply.error.code)
+        headers[ERROR_MESSAGE_HEADER] = reply.error.message
+        return reply.error.json().encode(), headers
+
+    async def _header_error_reply(
+        self,
+        exc: Exception,
+        request: JsonRPCRequest,
+        subject: str,
+    ) -> tuple[bytes, dict[str, str]]:
+        error = await self._error(exc, request, subject)
+        headers = {
+            ID_HEADER: str(request.id),
+            ERROR_CODE_HEADER: str(error.code),
+            ERROR_MESSAGE_HEADER: error.message,
+        }
+        return error.json().encode(), headers
+
+    async def _handle_raw_request(self, msg, route: RawRequest, received_at: float | None = None):
+        headers = msg.headers or {}
+        request = JsonRPCRequest.construct(
+            jsonrpc="2.0",
+            id=headers.get(ID_HEADER) or uuid4(),
+            method=None,
+            timeout=None,
+            params={"data": memoryview(msg.data), "headers": msg.headers},
+        )
+        CTX_JSONRPC_ID.set(request.id)
+        try:
+            if TIMEOUT_HEADER in headers:
+                request.timeout = float(headers[TIMEOUT_HEADER])
+            result = await self._dispatch(
+                "request",
+                msg.subject,
+                route,
+                request,
+                data=msg.data,
+                headers=msg.headers,
+                received_at=received_at,
+            )
+            payload = result if isinstance(result, bytes) else bytes(result or b"")
+            reply_headers = {ID_HEADER: str(request.id)}
+        except Exception as exc:
+            payload, reply_headers = await self._header_error_reply(exc, request, msg.subject)
+        if msg.reply and msg.reply != "None":
+            await self.publish_on_reply(msg.reply, payload, headers=reply_headers)
+
+    async def _request_local(
+        self,
+        subject: str,
+        route: Request | Publish,
+        params: dict[str, Any],
+        timeout: float,
+        method: str | None,
+    ) -> JsonRPCReply:
+        """
+        Runs the endpoint in a task of its own, so the JSON-RPC id in the context of the caller is left untouched.
+        A timeout is reported the same way as a request over NATS that got no reply in time.
+        """
+        request = JsonRPCRequest.construct(
+            jsonrpc="2.0",
+            id=self.request_ids(),
+            params=params,
+            method=method,
+            timeout=timeout,
+        )
+        task = asyncio.create_task(self._handle_local_request(subject, route, request))
+        try:
+            return await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError as e:
+            raise errors.TimeoutError from e
+
+    async def _handle_local_request(self, subject: str, route: Request | Publish, request: JsonRPCRequest):
+        CTX_JSONRPC_ID.set(request.id)
+        try:
+            logging.debug(f"Handling locally: {subject}")
+            result = await self._dispatch("request", subject, route, request, received_at=time.perf_counter())
+            return JsonRPCReply(id=request.id, result=self._result_as_dict(result))
+        except Exception as exc:
+            return await self._error_reply(exc, request, subject)
+
+    async def _publish_local(self, subject: str, route: Request | Publish, params: dict[str, Any]):
+        request = JsonRPCRequest.construct(jsonrpc="2.0", id=self.request_ids(), params=params, method=None, timeout=-1)
+        CTX_JSONRPC_ID.set(request.id)
+        logging.debug(f"Handling locally: {subject}")
+        await self._dispatch("publish", subject, route, request, received_at=time.perf_counter())
+
+    def _resolve_route(self, subject: str, method: str | None = None) -> Request | Publish | None:
+        """
+        Route to dispatch to in-process. Raw routes take the bytes of the message, so they always go over NATS.
+        """
+        route = self.routes.get(subject)
+        if route is None and method:
+            route = self.routes.get(".".join([subject, method]))
+        return None if isinstance(route, RawRequest) else route
+
+    def _build_middleware_stack(self, middleware: list[Middleware]) -> Dispatch | None:
+        """
+        Composed once, so dispatching without middleware doesn't pay for a stack that does nothing.
+        """
+        if not middleware:
+            return None
+        stack = self._dispatch_endpoint
+        for cls, options in reversed(middleware):
+            stack = cls(stack, **options)
+        return stack
+
+    async def _dispatch(
+        self,
+        kind: str,
+        subject: str,
+        route: Request | Publish,
+        request: JsonRPCRequest,
+        *,
+        data: bytes | None = None,
+        headers: dict[str, str] | None = None,
+        received_at: float | None = None,
+    ) -> Any:
+        if data is not None and route.max_payload is not None and len(data) > route.max_payload:
+            raise JsonRPCPayloadTooLargeException(data=f"Payload of {len(data)} bytes exceeds {route.max_payload}")
+        if route.rate_limit is not None and not await route.rate_limit.allow(subject, request, headers, self.nats):
+            raise JsonRPCRateLimitedException()
+
+        if self.concurrency_limit is None and route.concurrency_limit is None:
+            return await self._dispatch_timed(kind, subject, route, request, data, headers, received_at)
+
+        acquired: list[Limit] = []
+        for limit in (self.concurrency_limit, route.concurrency_limit):
+            if limit is None:
+                continue
+            if not limit.try_acquire():
+                for acquired_limit in acquired:
+                    acquired_limit.release(None)
+                raise JsonRPCServiceOverloadedException()
+            acquired.append(limit)
+
+        started = time.perf_counter()
+        dropped = False
+        try:
+            return await self._dispatch_timed(kind, subject, route, request, data, headers, received_at)
+        except (asyncio.TimeoutError, JsonRPCRequestTimeoutException):
+            dropped = True
+            raise
         finally:
-            await self.publish_on_reply(msg.reply, reply.json().encode())
+            rtt = time.perf_counter() - started
+            for limit in acquired:
+                limit.release(rtt, dropped)
+
+    async def _dispatch_timed(
+        self,
+        kind: str,
+        subject: str,
+        route: Request | Publish,
+        request: JsonRPCRequest,
+        data: bytes | None,
+        headers: dict[str, str] | None,
+        received_at: float | None,
+    ) -> Any:
+        if kind != "request" or not route.enforce_timeout:
+            return await self._dispatch_unlimited(kind, subject, route, request, data, headers, received_at)
+
+        # The tighter of the route's and the caller's timeout, minus the time the message was already waiting
+        budgets = [timeout for timeout in (route.suggested_timeout, request.timeout) if timeout and timeout > 0]
+        if not budgets:
+            return await self._dispatch_unlimited(kind, subject, route, request, data, headers, received_at)
+        started = time.perf_counter()
+        timeout = min(budgets) - (started - received_at if received_at is not None else 0)
+
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            return await asyncio.wait_for(
+                self._dispatch_unlimited(kind, subject, route, request, data, headers, received_at),
+                timeout,
+            )
+        except asyncio.TimeoutError as exc:
+            if time.perf_counter() - started < timeout:
+                # Raised by the handler itself, not by running out of time
+                raise
+            route.timed_out += 1
+            raise JsonRPCRequestTimeoutException(data=f"{subject} didn't reply within {min(budgets)}s") from exc
+
+    async def _dispatch_unlimited(
+        self,
+        kind: str,
+        subject: str,
+        route: Request | Publish,
+        request: JsonRPCRequest,
+        data: bytes | None,
+        headers: dict[str, str] | None,
+        received_at: float | None,
+    ) -> Any:
+        if self._middleware_stack is None:
+            return await self._call_endpoint(route, request.params)
+        scope = Scope(
+            kind=kind,
+            subject=subject,
+            route=route,
+            request=request,
+            data=data,
+            headers=headers,
+            received_at=received_at,
+            dispatched_at=time.perf_counter(),
+        )
+        return await self._middleware_stack(scope)
+
+    async def _dispatch_endpoint(self, scope: Scope) -> Any:
+        return await self._call_endpoint(scope.route, scope.request.params)
+
+    async def _call_endpoint(self, route: Request | Publish, params: dict[str, Any]) -> Any:
+        handler = route.endpoint
+        params_model = route.params
+        params = params if route.skip_validation else vars(params_model.parse_obj(params))
+
+        if not route.dependencies:
+            return await self._call_handler(handler, params)
+
+        async with AsyncExitStack() as stack:
+            values = await self.dependencies.resolve(route.dependencies, stack)
+            params = {**params, **{name: values[index] for name, index in route.dependency_arguments}}
+            return await self._call_handler(handler, params)
+
+    async def _call_handler(self, handler: Callable, params: dict[str, Any]) -> Any:
+        if inspect.iscoroutinefunction(handler):
+            return await handler(app=self.app, **params)
+        else:
+            return handler(self.app, **params)
+
+    @staticmethod
+    def _result_as_dict(result: Any) -> Any:
+        if not isinstance(result, dict):
+            if isinstance(result, RawResult):
+                result = json.loads(result.data)
+            elif hasattr(result, "dict"):
+                result = result.dict()
+            elif hasattr(result, "json"):
+                result = json.loads(result.json())
+        return result
+
+    async def _error_reply(self, exc: Exception, request: JsonRPCRequest, subject: str) -> JsonRPCReply:
+        return JsonRPCReply(id=request.id, error=await self._error(exc, request, subject))
+
+    async def _error(self, exc: Exception, request: JsonRPCRequest, subject: str) -> JsonRPCError:
+        exception_handler = self._lookup_exception_handler(exc)
+        if inspect.iscoroutinefunction(exception_handler):
+            return await exception_handler(exc, request, subject)
+        return exception_handler(exc, request, subject)
 
     def _lookup_exception_handler(self, exc: Exception) -> Callable | None:
         """
@@ -175,7 +1117,10 @@ class NatsClient:
         logging.warning(f"Got reconnected to {self.nats.connected_url.netloc}")
 
     async def shutdown(self, signal=None):
-        await self.nats.drain()
+        if self.admission is not None:
+            await self.admission.stop()
+        await asyncio.gather(*[nats.drain() for nats in self.pool])
         logging.info("All NATS connections put in drain state.")
-        await self.nats.close()
+        await asyncio.gather(*[nats.close() for nats in self.pool])
         logging.info("All NATS connections closed.")
+        await self.dependencies.close()
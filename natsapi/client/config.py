@@ -47,6 +47,8 @@ class ConnectConfig(BaseSettings):
     nkeys_seed: str | None = None
     flush_timeout: float | None = None
     pending_size: int = DEFAULT_PENDING_SIZE
+    # Connections NatsClient opens and spreads its traffic over, not an option of nats-py itself
+    pool_size: int = 1
 
 
 class SubscribeConfig(BaseSettings):
@@ -57,9 +59,30 @@ class SubscribeConfig(BaseSettings):
     pending_bytes_limit: Any = DEFAULT_SUB_PENDING_BYTES_LIMIT
 
 
+class AdmissionConfig(BaseSettings):
+    """
+    Thresholds above which incoming messages are rejected right away, 0 disables a threshold.
+
+    max_loop_lag: seconds the event loop runs behind, measured every `loop_lag_interval` seconds
+    max_in_flight: messages being handled at the same time
+    max_queued_bytes: bytes of the messages being handled plus those pending in the root path subscriptions
+    exempt_subjects: subjects of routes that are always admitted, relative to the root path
+    shed_publishes: also drop publishes, instead of only rejecting requests
+    """
+
+    enabled: bool = False
+    max_loop_lag: float = 0.5
+    loop_lag_interval: float = 0.1
+    max_in_flight: int = 0
+    max_queued_bytes: int = 0
+    exempt_subjects: list[str] = ["healthz", "schema.RETRIEVE"]
+    shed_publishes: bool = False
+
+
 class Config(BaseSettings):
     connect: ConnectConfig = ConnectConfig()
     subscribe: SubscribeConfig = SubscribeConfig()
+    admission: AdmissionConfig = AdmissionConfig()
 
 
 default_config = Config()
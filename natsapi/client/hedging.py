@@ -0,0 +1,111 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+from nats.aio.client import Client as NATS
+from nats.aio.msg import Msg
+
+
+class Hedging:
+    """
+    Sends the same request a second time when no reply came within a delay, and takes whichever reply comes first.
+    This cuts the latency of requests that end up at a slow member of a queue group.
+
+    delay: seconds to wait before hedging. When `None`, it's the `percentile` of the latencies of the last `window`
+    requests to the subject, and requests aren't hedged until `min_samples` latencies were seen.
+    budget: fraction of the requests that may be hedged, on average. Up to `max_burst` hedges can be saved up.
+
+    Both requests carry the same JSON-RPC id. A hedge policy keeps state, share one instance between the requests
+    that should count against the same budget.
+    """
+
+    def __init__(
+        self,
+        *,
+        delay: float | None = None,
+        percentile: float = 0.95,
+        window: int = 100,
+        min_samples: int = 20,
+        budget: float = 0.05,
+        max_burst: float = 10.0,
+    ):
+        assert delay is None or delay >= 0, "Expected delay >= 0"
+        assert 0 < percentile <= 1, "Expected 0 < percentile <= 1"
+        assert 0 <= budget <= 1, "Expected 0 <= budget <= 1"
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.budget = budget
+        self.max_burst = max_burst
+        self.requests = 0
+        self.hedge_sent = 0
+        self.hedge_won = 0
+        self._tokens = max_burst
+        self._latencies: dict[str, deque[float]] = {}
+
+    def delay(self, subject: str) -> float | None:
+        """
+        Seconds after which a request to `subject` is hedged, `None` when it isn't.
+        """
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        latencies = self._latencies.get(subject)
+        if latencies is None or len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
+
+    def observe(self, subject: str, latency: float) -> None:
+        latencies = self._latencies.get(subject)
+        if latencies is None:
+            latencies = self._latencies[subject] = deque(maxlen=self.window)
+        latencies.append(latency)
+
+    async def request(self, nats: NATS, subject: str, payload: bytes, timeout: float, headers: dict | None) -> Msg:
+        started = time.monotonic()
+        self.requests += 1
+        self._tokens = min(self.max_burst, self._tokens + self.budget)
+
+        first = asyncio.ensure_future(nats.request(subject, payload, timeout, headers=headers))
+        try:
+            delay = self.delay(subject)
+            if delay is not None and delay < timeout:
+                await asyncio.wait({first}, timeout=delay)
+            if first.done() or delay is None or delay >= timeout or self._tokens < 1:
+                msg = await first
+            else:
+                self._tokens -= 1
+                self.hedge_sent += 1
+                second = asyncio.ensure_future(nats.request(subject, payload, timeout - delay, headers=headers))
+                msg, winner = await self._first_reply(first, second)
+                if winner is second:
+                    self.hedge_won += 1
+        finally:
+            # Also when the caller is cancelled, no attempt should keep running on its own
+            first.cancel()
+
+        self.observe(subject, time.monotonic() - started)
+        return msg
+
+    @staticmethod
+    async def _first_reply(*requests: asyncio.Future) -> tuple[Msg, asyncio.Future]:
+        """
+        The first request that got a reply, only raises when all of them failed.
+        """
+        pending = set(requests)
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [request for request in requests if request in done and request.exception() is None]
+                if succeeded:
+                    return succeeded[0].result(), succeeded[0]
+                if not pending:
+                    return requests[0].result(), requests[0]
+        finally:
+            for request in pending:
+                request.cancel()
+
+    def stats(self) -> dict[str, int]:
+        return {"requests": self.requests, "hedge_sent": self.hedge_sent, "hedge_won": self.hedge_won}
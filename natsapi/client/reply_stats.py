@@ -0,0 +1,45 @@
+from collections import deque
+from typing import Any
+
+from nats.aio.client import Client as NATS
+
+
+class ReplyBatchStats:
+    """
+    Sends replies as usual and keeps track of how many of them are written to the socket together. It doesn't hold
+    back or coalesce replies itself, it only measures the coalescing nats-py already does.
+
+    nats-py's flusher writes every publish that's pending when it runs in one go: under light load a reply is
+    written on its own right away, under heavy load the replies that come in while the flusher is busy end up in a
+    single write. A batch is the replies that were sent since the pending buffer of the connection was last empty.
+
+    The sizes of the last `window` batches are kept, see `stats`.
+    """
+
+    def __init__(self, *, window: int = 1000):
+        self.replies = 0
+        self.batches = 0
+        self.batch_sizes: deque[int] = deque(maxlen=window)
+        self._batch: dict[NATS, int] = {}
+
+    async def write(self, nats: NATS, subject: str, payload: bytes, headers: dict[str, str] | None = None) -> None:
+        starts_batch = nats.pending_data_size == 0
+        await nats.publish(subject, payload, headers=headers)
+        self.replies += 1
+        if starts_batch or nats not in self._batch:
+            size = self._batch.get(nats, 0)
+            if size:
+                self.batch_sizes.append(size)
+            self.batches += 1
+            self._batch[nats] = 0
+        self._batch[nats] += 1
+
+    def stats(self) -> dict[str, Any]:
+        recent = [*self.batch_sizes, *(size for size in self._batch.values() if size)]
+        return {
+            "replies": self.replies,
+            "batches": self.batches,
+            "mean_batch_size": self.replies / self.batches if self.batches else 0.0,
+            "recent_mean_batch_size": sum(recent) / len(recent) if recent else 0.0,
+            "recent_max_batch_size": max(recent, default=0),
+        }
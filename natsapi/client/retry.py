@@ -0,0 +1,109 @@
+import asyncio
+import math
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from nats import errors
+
+
+class RetryBudget:
+    """
+    Caps retries to `ratio` of the requests, so retries can't pile up into a retry storm when a service is down.
+    Up to `max_tokens` retries can be saved up, which is also what's available at the start.
+    """
+
+    def __init__(self, *, ratio: float = 0.1, max_tokens: float = 10.0):
+        assert 0 <= ratio <= 1, "Expected 0 <= ratio <= 1"
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.requests = 0
+        self.retries = 0
+        self.rejected = 0
+        self._tokens = max_tokens
+
+    def deposit(self) -> None:
+        self.requests += 1
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens < 1:
+            self.rejected += 1
+            return False
+        self._tokens -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict[str, int]:
+        return {"requests": self.requests, "retries": self.retries, "rejected": self.rejected}
+
+
+default_retry_budget = RetryBudget()
+"""Shared by every retry policy that doesn't get a budget of its own"""
+
+
+class RetryPolicy:
+    """
+    Retries requests that timed out, had no responders or got a reply with one of the `retry_codes`.
+
+    Attempts are spaced by an exponential backoff with full jitter: a random delay up to
+    `base_delay * multiplier ** (attempt - 1)`, capped at `max_delay`. No attempt starts after `deadline` seconds
+    since the first one, and the timeout of an attempt is cut short to end before it. Every retry takes from
+    `budget`, a request gets no more retries when it's used up. The last error is raised, or the last reply with
+    an error is returned, when no more attempts are made.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 3,
+        retry_on: tuple[type[Exception], ...] = (errors.TimeoutError, errors.NoRespondersError),
+        # SERVICE_OVERLOADED, RATE_LIMITED and REQUEST_TIMEOUT
+        retry_codes: tuple[int, ...] = (-32000, -32001, -32002),
+        base_delay: float = 0.05,
+        multiplier: float = 2.0,
+        max_delay: float = 2.0,
+        deadline: float | None = None,
+        budget: RetryBudget | None = None,
+    ):
+        assert max_attempts >= 1, "Expected max_attempts >= 1"
+        self.max_attempts = max_attempts
+        self.retry_on = retry_on
+        self.retry_codes = set(retry_codes)
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.budget = budget if budget is not None else default_retry_budget
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1)))  # noqa: S311
+
+    def is_retryable(self, reply: Any) -> bool:
+        error = getattr(reply, "error", None)
+        return error is not None and error.code in self.retry_codes
+
+    async def run(self, send: Callable[[float], Awaitable[Any]], timeout: float) -> Any:
+        """
+        send: makes an attempt with the timeout it gets
+        """
+        deadline = time.monotonic() + (self.deadline if self.deadline is not None else math.inf)
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            failure = None
+            try:
+                reply = await send(min(timeout, deadline - time.monotonic()))
+                if not self.is_retryable(reply):
+                    return reply
+            except self.retry_on as exc:
+                failure = exc
+
+            delay = self.backoff(attempt)
+            if attempt >= self.max_attempts or time.monotonic() + delay >= deadline or not self.budget.withdraw():
+                if failure is not None:
+                    raise failure
+                return reply
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,102 @@
+import asyncio
+import inspect
+import time
+from collections.abc import Callable
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from typing import Any
+
+from natsapi.params import Depends
+
+
+class Dependant:
+    """
+    A dependency compiled for a route. `arguments` maps parameter names of the dependency to the index of the
+    dependency providing it, in the flat list of dependencies of the route.
+    """
+
+    def __init__(self, depends: Depends, arguments: list[tuple[str, int]], takes_app: bool):
+        self.call = depends.dependency
+        self.scope = depends.scope
+        self.ttl = depends.ttl
+        self.arguments = arguments
+        self.takes_app = takes_app
+        if inspect.isasyncgenfunction(self.call):
+            self.context_manager = asynccontextmanager(self.call)
+        elif inspect.isgeneratorfunction(self.call):
+            self.context_manager = contextmanager(self.call)
+        else:
+            self.context_manager = None
+        self.is_coroutine = inspect.iscoroutinefunction(self.call)
+        assert not (
+            self.scope == "cached" and self.context_manager
+        ), f"Dependency '{self.call.__name__}' with scope 'cached' can't be a generator, it has no point of teardown"
+
+
+class DependencyResolver:
+    """
+    Resolves the dependencies of a route in the order they were compiled, and keeps the values of dependencies
+    with scope "app" and "cached" around.
+    """
+
+    def __init__(self, app: Any = None):
+        self.app = app
+        self._app_stack = AsyncExitStack()
+        self._singletons: dict[Callable, asyncio.Future] = {}
+        self._cached: dict[Callable, tuple[float, Any]] = {}
+
+    async def resolve(self, dependencies: list[Dependant], stack: AsyncExitStack) -> list[Any]:
+        values = []
+        for dependant in dependencies:
+            kwargs = {name: values[index] for name, index in dependant.arguments}
+            if dependant.takes_app:
+                kwargs["app"] = self.app
+
+            if dependant.scope == "app":
+                value = await self._resolve_singleton(dependant, kwargs)
+            elif dependant.scope == "cached":
+                value = await self._resolve_cached(dependant, kwargs)
+            else:
+                value = await self._call(dependant, kwargs, stack)
+            values.append(value)
+        return values
+
+    async def _resolve_singleton(self, dependant: Dependant, kwargs: dict[str, Any]) -> Any:
+        if dependant.call not in self._singletons:
+            future = asyncio.get_running_loop().create_future()
+            self._singletons[dependant.call] = future
+            try:
+                future.set_result(await self._call(dependant, kwargs, self._app_stack))
+            except BaseException as exc:
+                del self._singletons[dependant.call]
+                future.set_exception(exc)
+                # Nobody else might be waiting for it, avoid "exception was never retrieved"
+                future.exception()
+                raise
+        return await asyncio.shield(self._singletons[dependant.call])
+
+    async def _resolve_cached(self, dependant: Dependant, kwargs: dict[str, Any]) -> Any:
+        now = time.monotonic()
+        expires_at, value = self._cached.get(dependant.call, (0, None))
+        if expires_at <= now:
+            value = await self._call(dependant, kwargs, None)
+            self._cached[dependant.call] = now + dependant.ttl, value
+        return value
+
+    @staticmethod
+    async def _call(dependant: Dependant, kwargs: dict[str, Any], stack: AsyncExitStack | None) -> Any:
+        if dependant.context_manager is not None:
+            context_manager = dependant.context_manager(**kwargs)
+            if inspect.isgeneratorfunction(dependant.call):
+                return stack.enter_context(context_manager)
+            return await stack.enter_async_context(context_manager)
+        if dependant.is_coroutine:
+            return await dependant.call(**kwargs)
+        return dependant.call(**kwargs)
+
+    async def close(self) -> None:
+        """
+        Tears down the dependencies with scope "app", in reverse order of creation.
+        """
+        await self._app_stack.aclose()
+        self._singletons.clear()
+        self._cached.clear()
@@ -16,6 +16,19 @@ class DuplicateRouteException(NatsAPIError):
         return f"{self.__class__.__name__} {self.msg}"
 
 
+class CircuitOpenError(NatsAPIError):
+    """
+    Raised by NatsClient.request instead of sending a request, while the circuit breaker of its subject is open.
+    """
+
+    def __init__(self, key: str, retry_after: float):
+        self.key = key
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f"{self.__class__.__name__} Circuit of {self.key} is open, retry after {self.retry_after:.2f}s"
+
+
 class JsonRPCException(Exception):
     def __init__(self, code: int, message: str, data: Any = None):
         super().__init__(message)
@@ -57,3 +70,31 @@ class JsonRPCInvalidParamsException(JsonRPCException):
         self.code = -32602
         self.message = "INVALID_PARAMETERS_RECEIVED"
         self.data = data
+
+
+class JsonRPCServiceOverloadedException(JsonRPCException):
+    def __init__(self, data: Any = None):
+        self.code = -32000
+        self.message = "SERVICE_OVERLOADED"
+        self.data = data
+
+
+class JsonRPCRateLimitedException(JsonRPCException):
+    def __init__(self, data: Any = None):
+        self.code = -32001
+        self.message = "RATE_LIMITED"
+        self.data = data
+
+
+class JsonRPCRequestTimeoutException(JsonRPCException):
+    def __init__(self, data: Any = None):
+        self.code = -32002
+        self.message = "REQUEST_TIMEOUT"
+        self.data = data
+
+
+class JsonRPCPayloadTooLargeException(JsonRPCException):
+    def __init__(self, data: Any = None):
+        self.code = -32003
+        self.message = "PAYLOAD_TOO_LARGE"
+        self.data = data
@@ -0,0 +1,225 @@
+import asyncio
+import base64
+import logging
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from nats.aio.client import Client as NATS
+from nats.js.errors import BucketNotFoundError, KeyDeletedError, KeyNotFoundError, KeyWrongLastSequenceError
+from nats.js.kv import KeyValue
+
+from natsapi.limits import KeyFunc, header_key
+from natsapi.models import JsonRPCReply, JsonRPCRequest, RawResultReply
+
+# The id comes right after "jsonrpc" in every encoded reply, before anything a result could contain
+_REPLY_ID = re.compile(rb'("id": ?")[^"]*"')
+
+
+def request_id_key(request: JsonRPCRequest, headers: dict[str, str] | None) -> str | None:
+    """
+    Idempotency key taken from the JSON-RPC id, for callers that send the same id when they retry.
+    """
+    return str(request.id) if request.id is not None else None
+
+
+class ReplyStore:
+    """
+    Where the replies of idempotent requests are kept.
+    """
+
+    async def claim(self, key: str, nats: NATS) -> bytes | None:
+        """
+        Returns the stored reply for `key`, or `None` when the caller should execute the request itself.
+        """
+        raise NotImplementedError()  # pragma: no cover
+
+    async def set(self, key: str, payload: bytes, nats: NATS) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+    async def release(self, key: str, nats: NATS) -> None:
+        """
+        Gives up a claim without storing a reply, so a retry executes the request again.
+        """
+
+
+class MemoryReplyStore(ReplyStore):
+    """
+    Keeps replies in memory for `ttl` seconds, up to `max_entries` of the most recently used ones.
+    Only retries that end up at the same instance are deduplicated.
+    """
+
+    def __init__(self, *, ttl: float = 300.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._replies: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    async def claim(self, key: str, nats: NATS) -> bytes | None:
+        entry = self._replies.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._replies[key]
+            return None
+        self._replies.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, payload: bytes, nats: NATS) -> None:
+        self._replies[key] = time.monotonic() + self.ttl, payload
+        self._replies.move_to_end(key)
+        if len(self._replies) > self.max_entries:
+            self._replies.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._replies)
+
+
+class KeyValueReplyStore(ReplyStore):
+    """
+    Keeps replies in the JetStream key-value `bucket` for `ttl` seconds, shared by every member of the queue group.
+
+    The first instance to see a key claims it with an empty value. Others wait up to `max_wait` seconds for the
+    reply to show up, checking every `poll_interval` seconds, and execute the request themselves when it doesn't.
+    Requires JetStream to be enabled on the server.
+    """
+
+    def __init__(
+        self,
+        *,
+        bucket: str = "natsapi_replies",
+        ttl: float = 300.0,
+        max_wait: float = 30.0,
+        poll_interval: float = 0.05,
+    ):
+        self.bucket = bucket
+        self.ttl = ttl
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self._kv: KeyValue | None = None
+
+    async def claim(self, key: str, nats: NATS) -> bytes | None:
+        kv = await self._key_value(nats)
+        kv_key = self._encode(key)
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            try:
+                await kv.create(kv_key, b"")
+                return None
+            except KeyWrongLastSequenceError:
+                pass
+            try:
+                entry = await kv.get(kv_key)
+            except (KeyNotFoundError, KeyDeletedError):
+                continue
+            if entry.value:
+                return entry.value
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    async def set(self, key: str, payload: bytes, nats: NATS) -> None:
+        kv = await self._key_value(nats)
+        await kv.put(self._encode(key), payload)
+
+    async def release(self, key: str, nats: NATS) -> None:
+        kv = await self._key_value(nats)
+        await kv.delete(self._encode(key))
+
+    async def _key_value(self, nats: NATS) -> KeyValue:
+        if self._kv is None:
+            js = nats.jetstream()
+            try:
+                self._kv = await js.key_value(self.bucket)
+            except BucketNotFoundError:
+                self._kv = await js.create_key_value(bucket=self.bucket, ttl=self.ttl)
+        return self._kv
+
+    @staticmethod
+    def _encode(value: str) -> str:
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+class Idempotency:
+    """
+    Replays the reply of a request to retries with the same idempotency key, instead of executing it again.
+
+    The key comes from the "idempotency-key" header by default, use `key=request_id_key` for callers that retry
+    with the same JSON-RPC id. Requests without a key are executed as usual. While the first execution is still
+    running, retries on the same instance wait for its reply. Only successful replies are stored, a retry of a
+    request that failed executes it again. A replayed reply gets the JSON-RPC id of the retry.
+
+    ```
+    @app.request("orders.CREATE", result=Order, idempotency=Idempotency(store=KeyValueReplyStore()))
+    async def create_order(app, order: OrderIn):
+        ...
+    ```
+    """
+
+    def __init__(self, *, key: KeyFunc | None = None, store: ReplyStore | None = None):
+        self.key = key if key is not None else header_key("idempotency-key")
+        self.store = store if store is not None else MemoryReplyStore()
+        self.replayed = 0
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    async def reply(
+        self,
+        key: str,
+        nats: NATS,
+        execute: Callable[[], Awaitable[JsonRPCReply | RawResultReply]],
+        id: Any = None,
+    ) -> bytes:
+        """
+        id: JSON-RPC id of the request, put in the reply when it's replayed
+        """
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.replayed += 1
+            return self._with_id(await asyncio.shield(in_flight), id)
+
+        future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        claimed = False
+        try:
+            payload = await self.store.claim(key, nats)
+            if payload is not None:
+                self.replayed += 1
+                future.set_result(payload)
+                return self._with_id(payload, id)
+            claimed = True
+            reply = await execute()
+            payload = reply.encode()
+            if reply.error is None:
+                await self.store.set(key, payload, nats)
+            else:
+                await self.store.release(key, nats)
+            claimed = False
+            future.set_result(payload)
+            return payload
+        except BaseException as exc:
+            if not future.done():
+                future.set_exception(exc)
+                # Nobody else might be waiting for it, avoid "exception was never retrieved"
+                future.exception()
+            if claimed:
+                # Also when cancelled, or retries on other instances would wait for a reply that never comes
+                await self._release(key, nats)
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def _release(self, key: str, nats: NATS) -> None:
+        try:
+            await asyncio.shield(self.store.release(key, nats))
+        except Exception as e:
+            logging.exception(e)
+
+    @staticmethod
+    def _with_id(payload: bytes, id: Any) -> bytes:
+        if id is None:
+            return payload
+        encoded = str(id).encode()
+        return _REPLY_ID.sub(lambda match: match[1] + encoded + b'"', payload, count=1)
+
+    def stats(self) -> dict[str, Any]:
+        return {"replayed": self.replayed, "in_flight": len(self._in_flight)}
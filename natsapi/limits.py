@@ -0,0 +1,300 @@
+import base64
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from nats.aio.client import Client as NATS
+from nats.js.errors import BucketNotFoundError, KeyNotFoundError, KeyWrongLastSequenceError
+from nats.js.kv import KeyValue
+
+from natsapi.models import JsonRPCRequest
+
+KeyFunc = Callable[[JsonRPCRequest, dict[str, str] | None], str | None]
+
+
+class Limit:
+    """
+    Adaptive concurrency limit, modelled after Netflix's concurrency-limits.
+
+    Every message takes a slot with `try_acquire` and gives it back with `release`, together with the time it took
+    to handle it. From these samples `update` derives how many messages may be handled at the same time.
+    Messages that don't get a slot are rejected.
+
+    A limit keeps state, pass a separate instance to every route that should be limited on its own.
+    """
+
+    def __init__(self, *, initial_limit: int = 20, min_limit: int = 1, max_limit: int = 1000):
+        assert 0 < min_limit <= initial_limit <= max_limit, "Expected 0 < min_limit <= initial_limit <= max_limit"
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.estimated_limit: float = initial_limit
+        self.in_flight = 0
+        self.rejected = 0
+        self.last_rtt: float | None = None
+
+    @property
+    def limit(self) -> int:
+        return int(self.estimated_limit)
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, rtt: float | None, dropped: bool = False) -> None:
+        """
+        rtt: seconds it took to handle the message, `None` if it shouldn't count as a sample
+        dropped: the message timed out, which is a sure sign of overload
+        """
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        if rtt is None:
+            return
+        self.last_rtt = rtt
+        limit = self.update(rtt, in_flight, dropped)
+        self.estimated_limit = max(self.min_limit, min(self.max_limit, limit))
+
+    def update(self, rtt: float, in_flight: int, dropped: bool) -> float:
+        raise NotImplementedError()  # pragma: no cover
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "last_rtt": self.last_rtt,
+        }
+
+
+class AIMDLimit(Limit):
+    """
+    Additive increase, multiplicative decrease: grows by one while the limit is being used,
+    and shrinks by `backoff_ratio` when a message is dropped or takes longer than `timeout` seconds.
+    """
+
+    def __init__(self, *, backoff_ratio: float = 0.9, timeout: float = 5.0, **kwargs):
+        super().__init__(**kwargs)
+        assert 0.5 <= backoff_ratio < 1, "backoff_ratio must be in [0.5, 1)"
+        self.backoff_ratio = backoff_ratio
+        self.timeout = timeout
+
+    def update(self, rtt: float, in_flight: int, dropped: bool) -> float:
+        if dropped or rtt > self.timeout:
+            return math.floor(self.estimated_limit * self.backoff_ratio)
+        if in_flight * 2 >= self.estimated_limit:
+            return self.estimated_limit + 1
+        return self.estimated_limit
+
+
+class ExpAvgMeasurement:
+    """
+    Average of the first `warmup` samples, exponential moving average over `window` samples after that.
+    """
+
+    def __init__(self, window: int, warmup: int):
+        self.window = window
+        self.warmup = warmup
+        self.count = 0
+        self.value = 0.0
+
+    def add(self, sample: float) -> float:
+        if self.count < self.warmup:
+            self.count += 1
+            self.value += (sample - self.value) / self.count
+        else:
+            factor = 2 / (self.window + 1)
+            self.value = self.value * (1 - factor) + sample * factor
+        return self.value
+
+
+class Gradient2Limit(Limit):
+    """
+    Compares the latest handling time (short RTT) to a long-term average (long RTT). While the short RTT is within
+    `rtt_tolerance` of the long RTT the limit grows by `queue_size`, when it drifts above it the limit shrinks
+    proportionally. Changes are smoothed with `smoothing`.
+    """
+
+    def __init__(
+        self,
+        *,
+        smoothing: float = 0.2,
+        rtt_tolerance: float = 1.5,
+        long_window: int = 600,
+        queue_size: int = 4,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        assert rtt_tolerance >= 1, "rtt_tolerance must be >= 1"
+        self.smoothing = smoothing
+        self.rtt_tolerance = rtt_tolerance
+        self.queue_size = queue_size
+        self.short_rtt: float | None = None
+        self.long_rtt = ExpAvgMeasurement(window=long_window, warmup=10)
+
+    def update(self, rtt: float, in_flight: int, dropped: bool) -> float:
+        self.short_rtt = rtt
+        long_rtt = self.long_rtt.add(rtt)
+
+        # Recover faster after a period of high latency, so the long RTT doesn't stick to it
+        if rtt > 0 and long_rtt / rtt > 2:
+            self.long_rtt.value *= 0.95
+
+        # Don't grow the limit while it isn't being used
+        if in_flight < self.estimated_limit / 2:
+            return self.estimated_limit
+
+        gradient = max(0.5, min(1.0, self.rtt_tolerance * long_rtt / rtt)) if rtt > 0 else 1.0
+        new_limit = self.estimated_limit * gradient + self.queue_size
+        return self.estimated_limit * (1 - self.smoothing) + new_limit * self.smoothing
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        stats["rtt_short"] = self.short_rtt
+        stats["rtt_long"] = self.long_rtt.value
+        return stats
+
+
+def param_key(path: str) -> KeyFunc:
+    """
+    Caller key taken from the params of a request, `path` is dotted for nested params, e.g. "auth.user_id".
+    """
+    parts = path.split(".")
+
+    def key(request: JsonRPCRequest, headers: dict[str, str] | None) -> str | None:
+        value: Any = request.params
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                return None
+            value = value[part]
+        return str(value)
+
+    return key
+
+
+def header_key(name: str) -> KeyFunc:
+    """
+    Caller key taken from a NATS header.
+    """
+
+    def key(request: JsonRPCRequest, headers: dict[str, str] | None) -> str | None:
+        return headers.get(name) if headers else None
+
+    return key
+
+
+class RateLimit:
+    """
+    Token bucket that allows `rate` messages per second, with bursts of up to `burst` messages.
+
+    Without `key` every message on the route shares one bucket. With `key`, every caller gets a bucket of its own,
+    messages for which `key` returns `None` share one. Only the `max_keys` most recently seen callers are kept.
+    Checked before the params are validated, messages over the limit fail with RATE_LIMITED.
+    """
+
+    def __init__(self, rate: float, *, burst: int | None = None, key: KeyFunc | None = None, max_keys: int = 10_000):
+        assert rate > 0, "rate must be positive"
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, math.ceil(rate))
+        self.key = key
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._buckets: OrderedDict[str | None, list[float]] = OrderedDict()
+
+    async def allow(self, subject: str, request: JsonRPCRequest, headers: dict[str, str] | None, nats: NATS) -> bool:
+        key = self.key(request, headers) if self.key is not None else None
+        if self._take(key):
+            return True
+        self.rejected += 1
+        return False
+
+    def _take(self, key: str | None) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return {"rate": self.rate, "burst": self.burst, "rejected": self.rejected, "callers": len(self._buckets)}
+
+
+class KeyValueRateLimit(RateLimit):
+    """
+    Cluster-wide rate limit: all instances count messages in the same JetStream key-value `bucket`, in fixed
+    windows of `period` seconds that allow `rate * period` messages each. Requires JetStream to be enabled
+    on the server, and costs a few round trips to it per message.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        *,
+        period: float = 1.0,
+        bucket: str = "natsapi_rate_limits",
+        key: KeyFunc | None = None,
+        retries: int = 5,
+    ):
+        super().__init__(rate, burst=max(1, round(rate * period)), key=key)
+        self.period = period
+        self.bucket = bucket
+        self.retries = retries
+        self._kv: KeyValue | None = None
+
+    async def allow(self, subject: str, request: JsonRPCRequest, headers: dict[str, str] | None, nats: NATS) -> bool:
+        caller = self.key(request, headers) if self.key is not None else None
+        window = int(time.time() // self.period)
+        kv_key = ".".join([str(window), self._encode(subject), self._encode(caller or "")])
+        kv = await self._key_value(nats)
+
+        for _ in range(self.retries):
+            try:
+                await kv.create(kv_key, b"1")
+                return True
+            except KeyWrongLastSequenceError:
+                pass
+            try:
+                entry = await kv.get(kv_key)
+            except KeyNotFoundError:
+                continue
+            count = int(entry.value) + 1
+            if count > self.burst:
+                self.rejected += 1
+                return False
+            try:
+                await kv.update(kv_key, str(count).encode(), last=entry.revision)
+                return True
+            except KeyWrongLastSequenceError:
+                continue
+        # Too much contention on the counter to tell, don't punish the caller for it
+        return True
+
+    async def _key_value(self, nats: NATS) -> KeyValue:
+        if self._kv is None:
+            js = nats.jetstream()
+            try:
+                self._kv = await js.key_value(self.bucket)
+            except BucketNotFoundError:
+                self._kv = await js.create_key_value(bucket=self.bucket, ttl=max(60.0, 2 * self.period))
+        return self._kv
+
+    @staticmethod
+    def _encode(value: str) -> str:
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=") or "_"
+
+    def stats(self) -> dict[str, Any]:
+        return {"rate": self.rate, "period": self.period, "rejected": self.rejected}
@@ -0,0 +1,90 @@
+from collections.abc import Awaitable, Callable
+from typing import Any, Literal
+
+from natsapi.models import JsonRPCRequest
+from natsapi.routing import Publish, Request
+from natsapi.state import State
+
+
+class Scope:
+    """
+    Everything a middleware gets to see of a message that is being dispatched.
+
+    `data` and `headers` are the raw NATS message body and headers. They are `None` when the message was
+    dispatched in-process (see `local_dispatch`). `received_at` and `dispatched_at` are `time.perf_counter()`
+    timestamps of when the message came in and when it was handed to the middleware stack.
+    """
+
+    def __init__(
+        self,
+        *,
+        kind: Literal["request", "publish"],
+        subject: str,
+        route: Request | Publish,
+        request: JsonRPCRequest,
+        data: bytes | None = None,
+        headers: dict[str, str] | None = None,
+        received_at: float | None = None,
+        dispatched_at: float | None = None,
+    ):
+        self.kind = kind
+        self.subject = subject
+        self.route = route
+        self.request = request
+        self.data = data
+        self.headers = headers
+        self.received_at = received_at
+        self.dispatched_at = dispatched_at
+        self.state = State()
+
+
+Dispatch = Callable[[Scope], Awaitable[Any]]
+
+
+class Middleware:
+    """
+    Yanked from starlette.middleware
+
+    Holds a middleware class and its options until the middleware stack is built on startup.
+    """
+
+    def __init__(self, cls: type, **options: Any) -> None:
+        self.cls = cls
+        self.options = options
+
+    def __iter__(self):
+        as_tuple = (self.cls, self.options)
+        return iter(as_tuple)
+
+    def __repr__(self) -> str:
+        class_name = self.__class__.__name__
+        option_strings = [f"{key}={value!r}" for key, value in self.options.items()]
+        args_repr = ", ".join([self.cls.__name__] + option_strings)
+        return f"{class_name}({args_repr})"
+
+
+class BaseMiddleware:
+    """
+    Convenience base class, only `dispatch` has to be implemented:
+
+    ```
+    class TimingMiddleware(BaseMiddleware):
+        async def dispatch(self, scope: Scope, call_next: Dispatch) -> Any:
+            result = await call_next(scope)
+            logger.info(f"{scope.subject} took {time.perf_counter() - scope.received_at}s")
+            return result
+
+    app.add_middleware(TimingMiddleware)
+    ```
+
+    `call_next` returns the result of the endpoint, which is `None` for publishes.
+    """
+
+    def __init__(self, app: Dispatch) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope) -> Any:
+        return await self.dispatch(scope, self.app)
+
+    async def dispatch(self, scope: Scope, call_next: Dispatch) -> Any:
+        raise NotImplementedError()  # pragma: no cover
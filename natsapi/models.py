@@ -1,10 +1,28 @@
+import itertools
+import json
+import os
+import secrets
+import weakref
+from collections.abc import Callable
 from datetime import datetime
+from functools import cache, cached_property
 from typing import Any
 from uuid import UUID, uuid4
 
 from pydantic import BaseModel, Field, create_model, root_validator, validator
 
+from natsapi.encoders import jsonable_encoder
 from natsapi.enums import JSON_RPC_VERSION
+from natsapi.exceptions import JsonRPCException
+
+# NATS headers that carry the JSON-RPC envelope for requests that don't have a JSON body
+ID_HEADER = "Jsonrpc-Id"
+TIMEOUT_HEADER = "Jsonrpc-Timeout"
+METHOD_HEADER = "Jsonrpc-Method"
+ERROR_CODE_HEADER = "Jsonrpc-Error-Code"
+ERROR_MESSAGE_HEADER = "Jsonrpc-Error-Message"
+# Seconds a client may keep a successful reply, set by routes with a `cache_ttl`
+CACHE_TTL_HEADER = "Jsonrpc-Cache-Ttl"
 
 
 class ErrorDetail(BaseModel):
@@ -44,6 +62,64 @@ class JsonRPCReply(BaseModel):
             )
         return values
 
+    def encode(self) -> bytes:
+        return self.json().encode()
+
+    @classmethod
+    @cache
+    def with_result(cls, result: type[BaseModel]):
+        return create_model("JsonRPCReply" + result.__name__, __base__=cls, result=(result | None, None))
+
+
+class RawResult:
+    """
+    A result that is already encoded as JSON, returned by an endpoint to have it put in the reply as is,
+    without decoding and encoding it again. Schema generation still uses the `result` of the endpoint.
+    The data must be a JSON object, like any other result. Only its braces are checked, not that it's valid JSON.
+
+    ```
+    @app.request("documents.RETRIEVE", result=Document)
+    async def retrieve_document(app, id: str):
+        return RawResult(await app.redis.get(f"documents:{id}"))
+    ```
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes | str):
+        self.data = data.encode() if isinstance(data, str) else bytes(data)
+        stripped = self.data.strip()
+        if len(stripped) < 2 or stripped[:1] != b"{" or stripped[-1:] != b"}":
+            raise ValueError("A RawResult must be a JSON object")
+
+    def __bytes__(self) -> bytes:
+        return self.data
+
+    def reply(self, id: UUID) -> "RawResultReply":
+        return RawResultReply(id, self)
+
+
+class RawResultReply:
+    """
+    A successful reply of which the result is spliced into the envelope, see `RawResult`.
+    """
+
+    __slots__ = ("id", "result")
+    error = None
+
+    def __init__(self, id: UUID, result: RawResult):
+        self.id = id
+        self.result = result
+
+    def encode(self) -> bytes:
+        return (
+            b'{"jsonrpc": "2.0", "id": "'
+            + str(self.id).encode()
+            + b'", "result": '
+            + self.result.data
+            + b', "error": null}'
+        )
+
 
 class JsonRPCRequest(BaseModel):
     jsonrpc: JSON_RPC_VERSION | None = Field("2.0")
@@ -62,3 +138,122 @@ class JsonRPCRequest(BaseModel):
     @classmethod
     def with_params(self, params: BaseModel):
         return create_model("JsonRPC" + params.__name__, __base__=self, params=(params, ...))
+
+
+class RequestIds:
+    """
+    Cheap unique ids for outgoing requests, formatted as UUIDs: a random prefix per process followed by a counter.
+    Unlike `uuid4` it doesn't take randomness from the OS for every id, so the ids are unique but predictable.
+    """
+
+    def __init__(self):
+        self._reset()
+        _request_ids.add(self)
+
+    def _reset(self) -> None:
+        prefix = secrets.token_hex(8)
+        self._prefix = f"{prefix[:8]}-{prefix[8:12]}-{prefix[12:]}-"
+        self._counter = itertools.count()
+
+    def __call__(self) -> str:
+        n = next(self._counter)
+        return f"{self._prefix}{n >> 48 & 0xFFFF:04x}-{n & 0xFFFFFFFFFFFF:012x}"
+
+
+_request_ids: "weakref.WeakSet[RequestIds]" = weakref.WeakSet()
+
+
+def _reset_request_ids() -> None:
+    # A forked child would otherwise hand out the same ids as its parent
+    for request_ids in list(_request_ids):
+        request_ids._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_request_ids)
+
+_request_encoder = json.JSONEncoder(default=jsonable_encoder)
+
+
+def encode_json(value: Any) -> bytes:
+    """
+    Encodes a value with the same encoder as `encode_request`, e.g. the params of a header-envelope request.
+    """
+    return _request_encoder.encode(value).encode()
+
+
+def encode_request(params: dict[str, Any], *, id: Any, timeout: float | None, method: str | None = None) -> bytes:
+    """
+    Encodes a JSON-RPC request without building a `JsonRPCRequest`, the params are not validated.
+    Only values that JSON doesn't know, like UUIDs, datetimes or models, go through `jsonable_encoder`.
+    """
+    request = {"jsonrpc": "2.0", "timeout": timeout, "method": method, "params": params, "id": id}
+    return _request_encoder.encode(request).encode()
+
+
+class PreEncodedErrorReply:
+    """
+    An error reply that is encoded once, to reply to messages that are rejected before they are parsed.
+
+    The id of the request is unknown at that point, so every reply gets a new one.
+    The timestamp of the error is the moment it was encoded.
+    """
+
+    _placeholder = str(UUID(int=0))
+
+    def __init__(self, exc: JsonRPCException):
+        self.exc = exc
+        data = exc.data if exc.data is not None else ErrorData(type=type(exc).__name__, errors=[])
+        error = JsonRPCError(code=exc.code, message=exc.message, data=data)
+        encoded = JsonRPCReply(id=self._placeholder, error=error).json().encode()
+        # For replies in the header envelope
+        self.error_payload = error.json().encode()
+        self.headers = {ERROR_CODE_HEADER: str(exc.code), ERROR_MESSAGE_HEADER: exc.message}
+        self._head, self._tail = encoded.split(self._placeholder.encode())
+
+    def __call__(self) -> bytes:
+        return self._head + str(uuid4()).encode() + self._tail
+
+
+class RawReply:
+    """
+    Reply to a raw request: `data` is what the endpoint returned, `error` is set instead when it failed.
+    """
+
+    def __init__(self, data: bytes, headers: dict[str, str] | None):
+        self.data = data
+        self.headers = headers or {}
+        self.id = self.headers.get(ID_HEADER)
+        self.error = JsonRPCError.parse_raw(data) if ERROR_CODE_HEADER in self.headers else None
+
+
+class LazyReply:
+    """
+    Reply to a request that is only decoded when its `result`, `error` or `id` is accessed.
+    `data` and `headers` are the reply as it was received, to forward it without decoding it at all.
+    """
+
+    def __init__(self, data: bytes, headers: dict[str, str] | None, decode: Callable[[], JsonRPCReply]):
+        self.data = data
+        self.headers = headers
+        self._decode = decode
+
+    @cached_property
+    def reply(self) -> JsonRPCReply:
+        return self._decode()
+
+    @property
+    def jsonrpc(self) -> str:
+        return self.reply.jsonrpc
+
+    @property
+    def id(self) -> UUID:
+        return self.reply.id
+
+    @property
+    def result(self) -> Any:
+        return self.reply.result
+
+    @property
+    def error(self) -> JsonRPCError | None:
+        return self.reply.error
@@ -0,0 +1,46 @@
+from collections.abc import Callable
+from typing import Any, Literal
+
+
+class Depends:
+    """
+    Declares a parameter of an endpoint, or of another dependency, that is provided by calling `dependency`.
+
+    ```
+    async def get_pool(app):
+        pool = await create_pool()
+        yield pool
+        await pool.close()
+
+    @router.request("persons.RETRIEVE", result=Person)
+    async def retrieve_person(app, id: int, pool=Depends(get_pool, scope="app")):
+        ...
+    ```
+
+    scope:
+        "request": called for every request, torn down when the endpoint returns (default)
+        "app": called once and shared by every request, torn down on shutdown
+        "cached": shared by every request until `ttl` seconds have passed, then called again
+
+    A dependency can be a (async) function or a (async) generator. Code after the `yield` of a generator is
+    used as teardown. The parameters of a dependency are either `app` or other dependencies.
+    Dependencies are not part of the params of a route, so they don't show up in the schema.
+    """
+
+    def __init__(
+        self,
+        dependency: Callable[..., Any],
+        *,
+        scope: Literal["request", "app", "cached"] = "request",
+        ttl: float | None = None,
+    ):
+        assert callable(dependency), "A dependency must be callable"
+        assert scope in ("request", "app", "cached"), f"Unknown scope '{scope}' for dependency"
+        assert (scope == "cached") == (ttl is not None), "A 'ttl' is required for, and only for, scope 'cached'"
+        self.dependency = dependency
+        self.scope = scope
+        self.ttl = ttl
+
+    def __repr__(self) -> str:
+        name = getattr(self.dependency, "__name__", type(self.dependency).__name__)
+        return f"{self.__class__.__name__}({name}, scope={self.scope!r})"
@@ -5,8 +5,16 @@ from typing import Any
 from pydantic import BaseModel
 
 from natsapi.asyncapi import ExternalDocumentation
-from natsapi.types import DecoratedCallable
-from natsapi.utils import create_field, generate_operation_id_for_subject, get_request_model, get_summary
+from natsapi.idempotency import Idempotency
+from natsapi.limits import Limit, RateLimit
+from natsapi.types import PRIORITIES, DecoratedCallable, Priority
+from natsapi.utils import (
+    create_field,
+    generate_operation_id_for_subject,
+    get_dependencies,
+    get_request_model,
+    get_summary,
+)
 
 
 class Request:
@@ -22,7 +30,14 @@ class Request:
         tags: list[str] | None = None,
         summary: str | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
         suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        idempotency: Idempotency | None = None,
+        cache_ttl: float | None = None,
     ):
         self.subject = subject
         self.endpoint = endpoint
@@ -31,6 +46,7 @@ class Request:
         self.operation_id = generate_operation_id_for_subject(summary=self.summary, subject=self.subject)
         self.result = result
         self.params = get_request_model(self.endpoint, subject, self.skip_validation)
+        self.dependencies, self.dependency_arguments = get_dependencies(self.endpoint)
         reply_name = "Reply_" + self.operation_id
         request_name = "Request_" + self.operation_id
         self.reply_field = create_field(name=reply_name, type_=self.params)
@@ -41,9 +57,18 @@ class Request:
         self.description = description or inspect.cleandoc(self.endpoint.__doc__ or "")
         self.deprecated = deprecated
         self.include_schema = include_schema
+        self.rate_limit = rate_limit
+        self.concurrency_limit = concurrency_limit
+        self.priority = priority
+        self.max_payload = max_payload
         self.suggested_timeout = suggested_timeout
+        self.enforce_timeout = enforce_timeout
+        self.timed_out = 0
+        self.idempotency = idempotency
+        self.cache_ttl = cache_ttl
 
         assert callable(endpoint), "An endpoint must be callable"
+        assert priority in PRIORITIES, f"Unknown priority '{priority}', expected one of {PRIORITIES}"
 
 
 class Publish:
@@ -58,6 +83,10 @@ class Publish:
         tags: list[str] | None = None,
         summary: str | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ):
         self.subject = subject
         self.endpoint = endpoint
@@ -65,6 +94,7 @@ class Publish:
         self.summary = summary or get_summary(endpoint) or subject
         self.operation_id = generate_operation_id_for_subject(summary=self.summary, subject=self.subject)
         self.params = get_request_model(self.endpoint, subject, self.skip_validation)
+        self.dependencies, self.dependency_arguments = get_dependencies(self.endpoint)
         reply_name = "Reply_" + self.operation_id
         self.reply_field = create_field(name=reply_name, type_=self.params, mode="serialization")
 
@@ -73,8 +103,72 @@ class Publish:
         self.description = description or inspect.cleandoc(self.endpoint.__doc__ or "")
         self.deprecated = deprecated
         self.include_schema = include_schema
+        self.rate_limit = rate_limit
+        self.concurrency_limit = concurrency_limit
+        self.priority = priority
+        self.max_payload = max_payload
 
         assert callable(endpoint), "An endpoint must be callable"
+        assert priority in PRIORITIES, f"Unknown priority '{priority}', expected one of {PRIORITIES}"
+
+
+class RawRequest:
+    """
+    A request whose endpoint gets the message body as-is, instead of JSON-RPC params, and replies with raw bytes:
+
+    ```
+    @app.raw_request("files.DOWNLOAD")
+    async def download(app, data: memoryview, headers: dict[str, str] | None) -> bytes:
+        ...
+    ```
+
+    The JSON-RPC id and timeout travel in the `Jsonrpc-Id` and `Jsonrpc-Timeout` headers. An error reply has
+    the `Jsonrpc-Error-Code` and `Jsonrpc-Error-Message` headers set, and the JSON-RPC error as body.
+    """
+
+    def __init__(
+        self,
+        subject: str,
+        endpoint: Callable[..., Any],
+        *,
+        description: str | None = None,
+        deprecated: bool | None = None,
+        tags: list[str] | None = None,
+        summary: str | None = None,
+        include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
+        suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+    ):
+        self.subject = subject
+        self.endpoint = endpoint
+        self.skip_validation = True
+        self.summary = summary or get_summary(endpoint) or subject
+        self.operation_id = generate_operation_id_for_subject(summary=self.summary, subject=self.subject)
+        self.params = None
+        self.dependencies, self.dependency_arguments = get_dependencies(self.endpoint)
+
+        self.tags = tags or []
+        self.description = description or inspect.cleandoc(self.endpoint.__doc__ or "")
+        self.deprecated = deprecated
+        self.include_schema = include_schema
+        self.rate_limit = rate_limit
+        self.concurrency_limit = concurrency_limit
+        self.priority = priority
+        self.max_payload = max_payload
+        self.suggested_timeout = suggested_timeout
+        self.enforce_timeout = enforce_timeout
+        self.timed_out = 0
+        self.idempotency = None
+        self.cache_ttl = None
+
+        assert callable(endpoint), "An endpoint must be callable"
+        assert priority in PRIORITIES, f"Unknown priority '{priority}', expected one of {PRIORITIES}"
+        parameters = inspect.signature(endpoint).parameters
+        assert "data" in parameters and "headers" in parameters, "A raw endpoint takes 'data' and 'headers'"
 
 
 class Sub:
@@ -149,7 +243,14 @@ class SubjectRouter:
         tags: list[str] | None = None,
         summary: str | None = None,
         suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        idempotency: Idempotency | None = None,
+        cache_ttl: float | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ) -> None:
         current_tags = self.tags.copy()
         if tags:
@@ -165,7 +266,14 @@ class SubjectRouter:
             tags=current_tags,
             summary=summary,
             suggested_timeout=suggested_timeout,
+            enforce_timeout=enforce_timeout,
+            idempotency=idempotency,
+            cache_ttl=cache_ttl,
             include_schema=include_schema,
+            rate_limit=rate_limit,
+            concurrency_limit=concurrency_limit,
+            priority=priority,
+            max_payload=max_payload,
         )
         self.routes.append(subject)
 
@@ -180,6 +288,10 @@ class SubjectRouter:
         tags: list[str] | None = None,
         summary: str | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ) -> None:
         current_tags = self.tags.copy()
         if tags:
@@ -194,6 +306,10 @@ class SubjectRouter:
             tags=current_tags,
             summary=summary,
             include_schema=include_schema,
+            rate_limit=rate_limit,
+            concurrency_limit=concurrency_limit,
+            priority=priority,
+            max_payload=max_payload,
         )
         self.routes.append(subject)
 
@@ -208,7 +324,14 @@ class SubjectRouter:
         tags: list[str] | None = None,
         summary: str | None = None,
         suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        idempotency: Idempotency | None = None,
+        cache_ttl: float | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ) -> Callable[[DecoratedCallable], DecoratedCallable]:
         def decorator(func: DecoratedCallable) -> DecoratedCallable:
             self.add_request(
@@ -221,7 +344,14 @@ class SubjectRouter:
                 tags=tags,
                 summary=summary,
                 suggested_timeout=suggested_timeout,
+                enforce_timeout=enforce_timeout,
+                idempotency=idempotency,
+                cache_ttl=cache_ttl,
                 include_schema=include_schema,
+                rate_limit=rate_limit,
+                concurrency_limit=concurrency_limit,
+                priority=priority,
+                max_payload=max_payload,
             )
             return func
 
@@ -238,6 +368,10 @@ class SubjectRouter:
         tags: list[str] | None = None,
         summary: str | None = None,
         include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
     ) -> Callable[[DecoratedCallable], DecoratedCallable]:
         def decorator(func: DecoratedCallable) -> DecoratedCallable:
             self.add_publish(
@@ -249,6 +383,84 @@ class SubjectRouter:
                 tags=tags,
                 summary=summary,
                 include_schema=include_schema,
+                rate_limit=rate_limit,
+                concurrency_limit=concurrency_limit,
+                priority=priority,
+                max_payload=max_payload,
+            )
+            return func
+
+        return decorator
+
+    def add_raw_request(
+        self,
+        subject: str,
+        endpoint: Callable[..., Any],
+        *,
+        description: str | None = None,
+        deprecated: bool | None = None,
+        tags: list[str] | None = None,
+        summary: str | None = None,
+        suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
+    ) -> None:
+        current_tags = self.tags.copy()
+        if tags:
+            current_tags.extend(tags)
+        current_subject = ".".join([self.prefix, subject]) if self.prefix is not None else subject
+        subject = RawRequest(
+            subject=current_subject,
+            endpoint=endpoint,
+            description=description,
+            deprecated=deprecated if deprecated is not None else self.deprecated,
+            tags=current_tags,
+            summary=summary,
+            suggested_timeout=suggested_timeout,
+            enforce_timeout=enforce_timeout,
+            include_schema=include_schema,
+            rate_limit=rate_limit,
+            concurrency_limit=concurrency_limit,
+            priority=priority,
+            max_payload=max_payload,
+        )
+        self.routes.append(subject)
+
+    def raw_request(
+        self,
+        subject: str,
+        *,
+        description: str | None = None,
+        deprecated: bool | None = None,
+        tags: list[str] | None = None,
+        summary: str | None = None,
+        suggested_timeout: float | None = None,
+        enforce_timeout: bool = False,
+        include_schema: bool | None = True,
+        rate_limit: RateLimit | None = None,
+        concurrency_limit: Limit | None = None,
+        priority: Priority = "normal",
+        max_payload: int | None = None,
+    ) -> Callable[[DecoratedCallable], DecoratedCallable]:
+        def decorator(func: DecoratedCallable) -> DecoratedCallable:
+            self.add_raw_request(
+                subject=subject,
+                endpoint=func,
+                description=description,
+                deprecated=deprecated,
+                tags=tags,
+                summary=summary,
+                suggested_timeout=suggested_timeout,
+                enforce_timeout=enforce_timeout,
+                include_schema=include_schema,
+                rate_limit=rate_limit,
+                concurrency_limit=concurrency_limit,
+                priority=priority,
+                max_payload=max_payload,
             )
             return func
 
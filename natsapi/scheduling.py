@@ -0,0 +1,302 @@
+import asyncio
+import bisect
+import json
+import secrets
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from nats.aio.msg import Msg
+
+from natsapi.routing import Publish, Request
+from natsapi.types import PRIORITIES, Priority
+
+TenantKey = Callable[[Msg, Request | Publish | None], str | None]
+Handle = Callable[[], Awaitable[None]]
+
+
+def header_tenant(name: str) -> TenantKey:
+    """
+    Tenant taken from a NATS header.
+    """
+
+    def key(msg: Msg, route: Request | Publish | None) -> str | None:
+        return msg.headers.get(name) if msg.headers else None
+
+    return key
+
+
+def param_tenant(path: str) -> TenantKey:
+    """
+    Tenant taken from the params of a message, `path` is dotted for nested params, e.g. "auth.tenant_id".
+    The body is decoded an extra time for this, prefer `header_tenant` when callers can set a header.
+    """
+    parts = ["params"] + path.split(".")
+
+    def key(msg: Msg, route: Request | Publish | None) -> str | None:
+        try:
+            value: Any = json.loads(msg.data)
+        except ValueError:
+            return None
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                return None
+            value = value[part]
+        return str(value)
+
+    return key
+
+
+def root_path_tenant() -> TenantKey:
+    """
+    Tenant taken from the root path the message came in on, for apps with a root path per tenant
+    through `include_router`.
+    """
+
+    def key(msg: Msg, route: Request | Publish | None) -> str | None:
+        if route is None:
+            return None
+        return msg.subject[: -(len(route.subject) + 1)]
+
+    return key
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, `buckets` are the upper bounds in seconds.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def stats(self) -> dict[str, Any]:
+        buckets = {str(bound): count for bound, count in zip(self.buckets, self.counts, strict=False)}
+        buckets["+Inf"] = self.counts[-1]
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class Scheduler:
+    """
+    Decides when the messages that came in are handled, at most `max_concurrency` at the same time.
+    Messages that can't start right away are queued until a running one is done.
+    """
+
+    wait_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self, *, max_concurrency: int = 100, max_keys: int = 1000):
+        assert max_concurrency > 0, "max_concurrency must be positive"
+        self.max_concurrency = max_concurrency
+        self.max_keys = max_keys
+        self.running = 0
+        self._waits: OrderedDict[str, Histogram] = OrderedDict()
+
+    def submit(self, msg: Msg, route: Request | Publish | None, handle: Handle) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+    def _dispatch_next(self) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+    def _start(self, key: str, enqueued_at: float, handle: Handle) -> None:
+        self._observe_wait(key, time.perf_counter() - enqueued_at)
+        self.running += 1
+        task = asyncio.create_task(handle(), name="natsapi_" + secrets.token_hex(16))
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.running -= 1
+        self._dispatch_next()
+
+    def _observe_wait(self, key: str, wait: float) -> None:
+        histogram = self._waits.get(key)
+        if histogram is None:
+            histogram = self._waits[key] = Histogram(self.wait_buckets)
+            if len(self._waits) > self.max_keys:
+                self._waits.popitem(last=False)
+        else:
+            self._waits.move_to_end(key)
+        histogram.observe(wait)
+
+    def _wait_stats(self, key: str) -> dict[str, Any]:
+        histogram = self._waits.get(key)
+        return (histogram or Histogram(self.wait_buckets)).stats()
+
+
+class FairScheduler(Scheduler):
+    """
+    Queues incoming messages per tenant and hands them out with deficit round robin, so a burst of one tenant
+    doesn't delay the messages of every other tenant.
+
+    At most `max_concurrency` messages are handled at the same time. Each round a tenant with queued messages gets
+    `weights[tenant] * quantum` credits (`default_weight` for tenants without a weight), and one message is started
+    per credit. Messages for which `key` returns `None` share the tenant "".
+
+    Queue depth and wait times (from arrival to start of handling) are kept per tenant, for the `max_tenants`
+    most recently seen tenants.
+
+    ```
+    app = NatsAPI("natsapi.dev", scheduler=FairScheduler(header_tenant("tenant"), weights={"acme": 2}))
+    ```
+    """
+
+    def __init__(
+        self,
+        key: TenantKey,
+        *,
+        max_concurrency: int = 100,
+        weights: dict[str, float] | None = None,
+        default_weight: float = 1.0,
+        quantum: float = 1.0,
+        max_tenants: int = 1000,
+    ):
+        assert default_weight > 0 and quantum > 0, "default_weight and quantum must be positive"
+        assert all(weight > 0 for weight in (weights or {}).values()), "Weights must be positive"
+        super().__init__(max_concurrency=max_concurrency, max_keys=max_tenants)
+        self.key = key
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.quantum = quantum
+        self._queues: dict[str, deque[tuple[float, Handle]]] = {}
+        self._deficits: dict[str, float] = {}
+        self._active: deque[str] = deque()
+        self._credited = False
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def submit(self, msg: Msg, route: Request | Publish | None, handle: Handle) -> None:
+        tenant = self.key(msg, route) or ""
+        if not self._active and self.running < self.max_concurrency:
+            self._start(tenant, time.perf_counter(), handle)
+            return
+
+        queue = self._queues.get(tenant)
+        if queue is None:
+            queue = self._queues[tenant] = deque()
+            self._deficits[tenant] = 0.0
+            self._active.append(tenant)
+        queue.append((time.perf_counter(), handle))
+        self._dispatch_next()
+
+    def _dispatch_next(self) -> None:
+        while self.running < self.max_concurrency and self._active:
+            tenant = self._active[0]
+            if not self._credited:
+                self._deficits[tenant] += self.weights.get(tenant, self.default_weight) * self.quantum
+                self._credited = True
+
+            if self._deficits[tenant] < 1:
+                self._active.rotate(-1)
+                self._credited = False
+                continue
+
+            self._deficits[tenant] -= 1
+            queue = self._queues[tenant]
+            enqueued_at, handle = queue.popleft()
+            if not queue:
+                # Credits don't carry over to a next burst
+                del self._queues[tenant], self._deficits[tenant]
+                self._active.popleft()
+                self._credited = False
+            self._start(tenant, enqueued_at, handle)
+
+    def stats(self) -> dict[str, Any]:
+        tenants = {tenant: {"queued": 0, "wait": histogram.stats()} for tenant, histogram in self._waits.items()}
+        for tenant, queue in self._queues.items():
+            tenants.setdefault(tenant, {"wait": self._wait_stats(tenant)})["queued"] = len(queue)
+        return {"running": self.running, "queued": self.queued, "tenants": tenants}
+
+
+class PriorityScheduler(Scheduler):
+    """
+    Serves messages in lanes by the `priority` of their route: "control" first, then "high", "normal" and "bulk".
+
+    Messages on "control" routes start right away, regardless of `max_concurrency`, so health checks and schema
+    requests never wait behind queued work. The other lanes share `max_concurrency` and are served highest first,
+    unless the oldest message of a lower lane has waited longer than `max_wait` seconds: then that one goes first,
+    so a busy lane can't starve the ones below it. Messages on unknown subjects go in the "normal" lane.
+
+    With `header`, callers pick a lane in that NATS header, up to `max_header_priority`. Routes with priority
+    "control" can't be moved out of their lane.
+
+    ```
+    @app.request("healthz", priority="control")
+    def healthz(app):
+        return {"status": "OK"}
+
+    app = NatsAPI("natsapi.dev", scheduler=PriorityScheduler(max_concurrency=50, header="x-priority"))
+    ```
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 100,
+        max_wait: float = 1.0,
+        header: str | None = None,
+        max_header_priority: Priority = "high",
+    ):
+        super().__init__(max_concurrency=max_concurrency)
+        assert max_wait > 0, "max_wait must be positive"
+        assert max_header_priority in PRIORITIES[1:], "max_header_priority must be 'high', 'normal' or 'bulk'"
+        self.max_wait = max_wait
+        self.header = header
+        self.header_priorities = PRIORITIES[PRIORITIES.index(max_header_priority) :]
+        self.promoted = 0
+        self._lanes: dict[Priority, deque[tuple[float, Handle]]] = {lane: deque() for lane in PRIORITIES[1:]}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._lanes.values())
+
+    def priority_of(self, msg: Msg, route: Request | Publish | None) -> Priority:
+        priority = route.priority if route is not None else "normal"
+        if priority != "control" and self.header is not None and msg.headers:
+            requested = msg.headers.get(self.header)
+            if requested in self.header_priorities:
+                return requested
+        return priority
+
+    def submit(self, msg: Msg, route: Request | Publish | None, handle: Handle) -> None:
+        priority = self.priority_of(msg, route)
+        now = time.perf_counter()
+        if priority == "control" or (self.running < self.max_concurrency and not self.queued):
+            self._start(priority, now, handle)
+            return
+        self._lanes[priority].append((now, handle))
+        self._dispatch_next()
+
+    def _dispatch_next(self) -> None:
+        while self.running < self.max_concurrency and (lane := self._next_lane()) is not None:
+            enqueued_at, handle = self._lanes[lane].popleft()
+            self._start(lane, enqueued_at, handle)
+
+    def _next_lane(self) -> Priority | None:
+        highest = starved = None
+        deadline = time.perf_counter() - self.max_wait
+        for lane, queue in self._lanes.items():
+            if not queue:
+                continue
+            if highest is None:
+                highest = lane
+            if queue[0][0] < deadline and (starved is None or queue[0][0] < self._lanes[starved][0][0]):
+                starved = lane
+        if starved is not None and starved != highest:
+            self.promoted += 1
+            return starved
+        return highest
+
+    def stats(self) -> dict[str, Any]:
+        lanes = {
+            lane: {"queued": len(self._lanes.get(lane, ())), "wait": self._wait_stats(lane)} for lane in PRIORITIES
+        }
+        return {"running": self.running, "queued": self.queued, "promoted": self.promoted, "lanes": lanes}
@@ -1,6 +1,9 @@
 """Yanked from FastApi.typing"""
 
 from collections.abc import Callable
-from typing import Any, TypeVar
+from typing import Any, Literal, TypeVar
 
 DecoratedCallable = TypeVar("DecoratedCallable", bound=Callable[..., Any])
+
+Priority = Literal["control", "high", "normal", "bulk"]
+PRIORITIES: tuple[Priority, ...] = ("control", "high", "normal", "bulk")
@@ -11,7 +11,9 @@ from pydantic.v1.schema import model_process_schema
 
 from natsapi._compat import PYDANTIC_V2, ModelField
 from natsapi.asyncapi.constants import REF_PREFIX
+from natsapi.dependencies import Dependant
 from natsapi.exceptions import NatsAPIError
+from natsapi.params import Depends
 
 
 def get_summary(endpoint: Callable) -> str:
@@ -115,7 +117,7 @@ def get_request_model(func: Callable, subject: str, skip_validation: bool):
                 ), f"Valid types for app are: NatsAPI, FastAPI, or Any. Got {parameter.annotation.__name__}"
                 continue
 
-        if parameter.name in ["args", "kwargs"] and skip_validation:
+        if (parameter.name in ["args", "kwargs"] and skip_validation) or isinstance(parameter.default, Depends):
             continue
         else:
             assert parameter.annotation is not inspect._empty, f"{parameter.name} has no type"
@@ -124,3 +126,50 @@ def get_request_model(func: Callable, subject: str, skip_validation: bool):
 
     model = create_model(f"{name_prefix}_params", **param_fields)
     return model
+
+
+def get_dependencies(func: Callable) -> tuple[list[Dependant], list[tuple[str, int]]]:
+    """
+    Compiles the dependencies of an endpoint into a flat list, ordered so that every dependency comes after the
+    dependencies it needs itself. A dependency used more than once is only called once per request.
+
+    Returns the flat list and the (parameter name, index in the flat list) pairs for the endpoint.
+    """
+    dependencies: list[Dependant] = []
+    compiled: dict[tuple[Callable, str], int] = {}
+
+    def compile_arguments(call: Callable, resolving: tuple[Callable, ...]) -> list[tuple[str, int]]:
+        arguments = []
+        for parameter in inspect.signature(call).parameters.values():
+            if isinstance(parameter.default, Depends):
+                arguments.append((parameter.name, compile_dependency(parameter.default, resolving)))
+        return arguments
+
+    def compile_dependency(depends: Depends, resolving: tuple[Callable, ...]) -> int:
+        key = (depends.dependency, depends.scope)
+        if key in compiled:
+            return compiled[key]
+        name = getattr(depends.dependency, "__name__", repr(depends))
+        assert depends.dependency not in resolving, f"Dependency '{name}' depends on itself"
+
+        parameters = inspect.signature(depends.dependency).parameters.values()
+        for parameter in parameters:
+            assert parameter.name == "app" or isinstance(
+                parameter.default,
+                Depends,
+            ), f"Parameter '{parameter.name}' of dependency '{name}' should be named 'app' or use Depends"
+        takes_app = any(parameter.name == "app" for parameter in parameters)
+
+        arguments = compile_arguments(depends.dependency, (*resolving, depends.dependency))
+        if depends.scope != "request":
+            for parameter_name, index in arguments:
+                assert dependencies[index].scope != "request", (
+                    f"Dependency '{name}' with scope '{depends.scope}' outlives request-scoped dependency "
+                    f"'{parameter_name}', which is torn down after every request"
+                )
+        dependencies.append(Dependant(depends, arguments, takes_app))
+        compiled[key] = len(dependencies) - 1
+        return compiled[key]
+
+    arguments = compile_arguments(func, ())
+    return dependencies, arguments
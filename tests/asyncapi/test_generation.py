@@ -250,6 +250,22 @@ async def test_generate_shema_w_publishes_should_generate(app: NatsAPI):
     assert schema_from_request == schema
 
 
+async def test_generate_schema_w_raw_requests_should_have_binary_content_type(app: NatsAPI):
+    @app.raw_request("files.DOWNLOAD", suggested_timeout=5)
+    async def download_file(app, data: memoryview, headers: dict[str, str] | None):
+        return bytes(data)
+
+    app.generate_asyncapi()
+    request = app.asyncapi_schema["channels"]["natsapi.development.files.DOWNLOAD"]["request"]
+
+    assert request["operationId"] == "download_file_files_DOWNLOAD"
+    assert request["x-suggested-timeout"] == 5
+    assert request["message"]["contentType"] == "application/octet-stream"
+    assert request["message"]["payload"] == {"type": "string", "format": "binary"}
+    assert request["replies"][0]["contentType"] == "application/octet-stream"
+    assert request["replies"][1]["payload"] == {"$ref": "#/components/schemas/JsonRPCError"}
+
+
 def test_dont_include_in_schema_should_generate():
     router = SubjectRouter()
 
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+
+from natsapi import NatsAPI
+from natsapi.client import AdmissionConfig, Config
+
+
+@pytest.fixture(scope="function")
+async def busy_app(client_config, event_loop):
+    admission = AdmissionConfig(enabled=True, max_in_flight=1, max_loop_lag=0.05, loop_lag_interval=0.01)
+    app = NatsAPI("natsapi.development", client_config=Config(connect=client_config.connect, admission=admission))
+    app.release = asyncio.Event()
+
+    @app.request("slow")
+    async def _(app):
+        await app.release.wait()
+        return {"status": "done"}
+
+    @app.request("healthz")
+    async def _(app):
+        return {"status": "OK"}
+
+    await app.startup(loop=event_loop)
+    yield app
+    app.release.set()
+    await app.shutdown(app)
+
+
+async def test_request_over_max_in_flight_should_be_rejected(busy_app):
+    slow = asyncio.create_task(busy_app.nc.request("natsapi.development.slow", {}, timeout=5))
+    await asyncio.sleep(0.05)
+
+    reply = await busy_app.nc.request("natsapi.development.slow", {}, timeout=1)
+
+    assert reply.error.code == -32000
+    assert reply.error.message == "SERVICE_OVERLOADED"
+    assert busy_app.nc.admission.rejected == 1
+
+    busy_app.release.set()
+    assert (await slow).result["status"] == "done"
+    assert busy_app.nc.admission.in_flight == 0
+
+
+async def test_exempt_route_should_be_admitted_when_overloaded(busy_app):
+    slow = asyncio.create_task(busy_app.nc.request("natsapi.development.slow", {}, timeout=5))
+    await asyncio.sleep(0.05)
+
+    reply = await busy_app.nc.request("natsapi.development.healthz", {}, timeout=1)
+
+    assert reply.result["status"] == "OK"
+    busy_app.release.set()
+    await slow
+
+
+async def test_request_should_be_rejected_while_event_loop_lags(busy_app):
+    time.sleep(0.2)
+    await asyncio.sleep(0.02)
+    assert busy_app.nc.admission.loop_lag > 0.05
+
+    reply = await busy_app.nc.request("natsapi.development.slow", {}, timeout=1)
+    assert reply.error.message == "SERVICE_OVERLOADED"
+
+    await asyncio.sleep(0.3)
+    assert busy_app.nc.admission.loop_lag < 0.05
+
+
+async def test_publish_should_not_be_dropped_by_default(client_config, event_loop):
+    received = []
+    admission = AdmissionConfig(enabled=True, max_in_flight=1)
+    app = NatsAPI("natsapi.development", client_config=Config(connect=client_config.connect, admission=admission))
+
+    @app.publish("foo")
+    async def _(app):
+        await asyncio.sleep(0.05)
+        received.append(1)
+
+    await app.startup(loop=event_loop)
+    await app.nc.publish("natsapi.development.foo", {})
+    await app.nc.publish("natsapi.development.foo", {})
+    await asyncio.sleep(0.2)
+    await app.shutdown(app)
+
+    assert len(received) == 2
+
+
+def test_admission_should_be_disabled_by_default():
+    assert AdmissionConfig().enabled is False
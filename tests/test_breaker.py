@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from nats.errors import NoRespondersError
+
+from natsapi.client import CircuitBreakers, RetryBudget, RetryPolicy, subject_prefix
+from natsapi.exceptions import CircuitOpenError
+
+
+async def test_circuit_should_open_and_fail_fast(app):
+    app.nc.breakers = CircuitBreakers(min_requests=2, open_for=60)
+    sent = app.nc.nats.stats["out_msgs"]
+
+    for _ in range(2):
+        with pytest.raises(NoRespondersError):
+            await app.nc.request("nobody.home", {}, timeout=1)
+    with pytest.raises(CircuitOpenError) as e:
+        await app.nc.request("nobody.home", {}, timeout=1, retry=RetryPolicy(budget=RetryBudget()))
+
+    assert e.value.key == "nobody.home"
+    assert 59 < e.value.retry_after <= 60
+    assert app.nc.nats.stats["out_msgs"] == sent + 2
+    assert app.nc.breakers.stats()["nobody.home"] == {
+        "state": "open",
+        "requests": 2,
+        "failures": 2,
+        "opened": 1,
+        "rejected": 1,
+    }
+
+
+async def test_half_open_probe_should_close_the_circuit(app):
+    healthy = False
+
+    @app.request("flaky", include_schema=False)
+    async def _(app):
+        if not healthy:
+            raise RuntimeError("down")
+        return {"status": "OK"}
+
+    app.nc.breakers = CircuitBreakers(key=subject_prefix(2), min_requests=1, open_for=0.05)
+    subject = "natsapi.development.flaky"
+
+    failed = await app.nc.request(subject, {}, timeout=1)
+    await asyncio.sleep(0.05)
+    probe = await app.nc.request(subject, {}, timeout=1)
+    with pytest.raises(CircuitOpenError):
+        await app.nc.request(subject, {}, timeout=1)
+
+    healthy = True
+    await asyncio.sleep(0.05)
+    recovered = await app.nc.request(subject, {}, timeout=1)
+    after = await app.nc.request(subject, {}, timeout=1)
+
+    assert failed.error.code == -40000
+    assert probe.error.code == -40000
+    assert recovered.result == after.result == {"status": "OK"}
+    assert app.nc.breakers.stats()["natsapi.development"]["state"] == "closed"
+    assert app.nc.breakers.stats()["natsapi.development"]["opened"] == 2
+
+
+async def test_validation_errors_should_not_open_the_circuit(app):
+    @app.request("strict", include_schema=False)
+    async def _(app, id: int):
+        return {"id": id}
+
+    app.nc.breakers = CircuitBreakers(min_requests=1)
+
+    for _ in range(3):
+        reply = await app.nc.request("natsapi.development.strict", {"id": "not an id"}, timeout=1)
+        assert reply.error.code == -40001
+
+    assert app.nc.breakers.stats()["natsapi.development.strict"]["state"] == "closed"
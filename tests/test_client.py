@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from natsapi import NatsAPI
+from natsapi.client import Config, ConnectConfig, NatsClient, RetryPolicy
+
+
+async def test_standalone_client_should_only_connect(app, client_config):
+    @app.request("persons.greet", include_schema=False)
+    async def _(app, name: str):
+        return {"message": f"Greetings {name}!"}
+
+    retry = RetryPolicy()
+    async with await NatsClient.connect_standalone(client_config, retry=retry) as nc:
+        reply = await nc.request("natsapi.development.persons.greet", {"name": "Foo"}, timeout=1)
+        await nc.publish("natsapi.development.persons.greet", {"name": "Bar"})
+
+        assert nc.subscriptions == []
+        assert nc.retry is retry
+        assert nc.nats.is_connected
+
+    assert reply.result == {"message": "Greetings Foo!"}
+    assert nc.nats.is_closed
+
+
+async def test_pooled_client_should_spread_traffic_over_its_connections(client_config, event_loop):
+    config = Config(connect=ConnectConfig(servers=client_config.connect.servers, pool_size=3))
+    app = NatsAPI("natsapi.development", client_config=config)
+    calls = []
+
+    @app.request("persons.greet", include_schema=False)
+    async def _(app, name: str):
+        calls.append(name)
+        return {"message": f"Greetings {name}!"}
+
+    await app.startup(loop=event_loop)
+    replies = await asyncio.gather(
+        *[app.nc.request("natsapi.development.persons.greet", {"name": str(i)}, timeout=1) for i in range(30)],
+    )
+    stats = app.nc.pool_stats()
+    await app.shutdown(app)
+
+    assert sorted(calls) == sorted(str(i) for i in range(30))
+    assert all(reply.result["message"].startswith("Greetings") for reply in replies)
+    assert len(stats) == 3
+    assert all(connection["out_msgs"] > 0 and connection["in_msgs"] > 0 for connection in stats)
+
+
+def test_publishes_to_a_subject_should_take_the_same_connection():
+    nc = NatsClient({})
+    nc.pool = [object(), object(), object()]
+
+    assert len({id(nc.connection("foo")) for _ in range(10)}) == 1
+    assert len({id(nc.connection()) for _ in range(3)}) == 3
+
+
+def test_request_ids_that_arent_uuids_should_be_rejected():
+    with pytest.raises(AssertionError):
+        NatsClient({}, request_ids=lambda: "01ARZ3NDEKTSV4RRFFQ69G5FAV")
+
+    assert NatsClient({}, request_ids=lambda: "00000000-0000-0000-0000-000000000001")
@@ -0,0 +1,189 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from natsapi import Depends, NatsAPI, SubjectRouter
+
+
+class StatusResult(BaseModel):
+    status: str
+
+
+async def test_request_dependency_should_be_injected_and_torn_down(app):
+    events = []
+
+    async def get_connection(app):
+        events.append("open")
+        yield f"connection of {app.root_path}"
+        events.append("close")
+
+    @app.request("foo")
+    async def _(app, foo: int, connection=Depends(get_connection)):
+        events.append("handle")
+        return {"connection": connection, "foo": foo}
+
+    reply = await app.nc.request("natsapi.development.foo", {"foo": 1})
+
+    assert reply.result == {"connection": "connection of natsapi.development", "foo": 1}
+    assert events == ["open", "handle", "close"]
+
+
+async def test_request_dependency_should_be_called_for_each_request(app):
+    calls = []
+
+    def get_value():
+        calls.append(1)
+        return len(calls)
+
+    @app.request("foo")
+    def _(app, value=Depends(get_value)):
+        return {"value": value}
+
+    assert (await app.nc.request("natsapi.development.foo", {})).result["value"] == 1
+    assert (await app.nc.request("natsapi.development.foo", {})).result["value"] == 2
+
+
+async def test_app_dependency_should_be_created_once_and_torn_down_on_shutdown(client_config, event_loop):
+    events = []
+
+    async def get_pool():
+        events.append("open")
+        yield "pool"
+        events.append("close")
+
+    app = NatsAPI("natsapi.development", client_config=client_config)
+
+    @app.request("foo")
+    async def _(app, pool=Depends(get_pool, scope="app")):
+        return {"pool": pool}
+
+    await app.startup(loop=event_loop)
+    replies = await asyncio.gather(*[app.nc.request("natsapi.development.foo", {}) for _ in range(5)])
+    assert events == ["open"]
+    await app.shutdown(app)
+
+    assert all(reply.result["pool"] == "pool" for reply in replies)
+    assert events == ["open", "close"]
+
+
+async def test_cached_dependency_should_be_called_again_after_ttl(app):
+    calls = []
+
+    def get_config():
+        calls.append(1)
+        return {"version": len(calls)}
+
+    @app.request("foo")
+    def _(app, config=Depends(get_config, scope="cached", ttl=0.1)):
+        return config
+
+    assert (await app.nc.request("natsapi.development.foo", {})).result["version"] == 1
+    assert (await app.nc.request("natsapi.development.foo", {})).result["version"] == 1
+    await asyncio.sleep(0.15)
+    assert (await app.nc.request("natsapi.development.foo", {})).result["version"] == 2
+
+
+async def test_shared_sub_dependency_should_be_resolved_once_per_request(app):
+    calls = []
+
+    def get_tenant():
+        calls.append(1)
+        return "wegroup"
+
+    def get_repository(tenant=Depends(get_tenant)):
+        return f"repository of {tenant}"
+
+    @app.request("foo")
+    def _(app, repository=Depends(get_repository), tenant=Depends(get_tenant)):
+        return {"repository": repository, "tenant": tenant}
+
+    reply = await app.nc.request("natsapi.development.foo", {})
+
+    assert reply.result == {"repository": "repository of wegroup", "tenant": "wegroup"}
+    assert len(calls) == 1
+
+
+async def test_error_in_endpoint_should_still_tear_down_dependency(app):
+    events = []
+
+    async def get_connection():
+        try:
+            yield "connection"
+        finally:
+            events.append("close")
+
+    @app.request("foo", result=StatusResult)
+    async def _(app, connection=Depends(get_connection)):
+        raise ValueError("foo")
+
+    reply = await app.nc.request("natsapi.development.foo", {})
+
+    assert reply.error.code == -40000
+    assert events == ["close"]
+
+
+async def test_publish_should_get_dependencies(client_config, event_loop):
+    received = []
+    app = NatsAPI("natsapi.development", client_config=client_config)
+    router = SubjectRouter()
+
+    @router.publish("foo")
+    async def _(app, value=Depends(lambda: "injected")):
+        received.append(value)
+
+    app.include_router(router)
+    await app.startup(loop=event_loop)
+    await app.nc.publish("natsapi.development.foo", {})
+    await asyncio.sleep(0.1)
+    await app.shutdown(app)
+
+    assert received == ["injected"]
+
+
+async def test_dependencies_should_not_be_in_params_or_schema(app):
+    def get_secret():
+        return "secret"
+
+    @app.request("foo", result=StatusResult)
+    def foo(app, bar: int, secret: str = Depends(get_secret)):
+        return {"status": "OK"}
+
+    schema = (await app.nc.request("natsapi.development.schema.RETRIEVE", {})).result
+
+    assert list(app.routes["natsapi.development.foo"].params.__fields__) == ["bar"]
+    assert "secret" not in schema["components"]["schemas"]["foo_params"]["properties"]
+
+
+def test_dependency_with_unknown_parameter_should_fail():
+    def get_user(user_id: int):
+        return user_id
+
+    app = NatsAPI("natsapi.development")
+
+    with pytest.raises(AssertionError):
+
+        @app.request("foo")
+        def _(app, user=Depends(get_user)):
+            pass
+
+
+def test_cached_dependency_without_ttl_should_fail():
+    with pytest.raises(AssertionError):
+        Depends(lambda: None, scope="cached")
+
+
+def test_long_lived_dependency_on_request_dependency_should_fail():
+    def get_session():
+        yield "session"
+
+    def get_client(session=Depends(get_session)):
+        return session
+
+    app = NatsAPI("natsapi.development")
+
+    with pytest.raises(AssertionError, match="outlives request-scoped dependency 'session'"):
+
+        @app.request("foo")
+        def _(app, client=Depends(get_client, scope="app")):
+            pass
@@ -0,0 +1,135 @@
+import json
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+from natsapi import SubjectRouter
+from natsapi.idempotency import Idempotency
+from natsapi.models import JsonRPCReply
+
+
+class Person(BaseModel):
+    name: str
+    age: int
+
+
+async def test_header_envelope_should_carry_only_params_and_result_in_the_body(app):
+    @app.request("persons.CREATE", result=Person)
+    async def _(app, name: str, age: int):
+        return Person(name=name, age=age)
+
+    msg = await app.nc.nats.request(
+        "natsapi.development.persons.CREATE",
+        b'{"name": "foo", "age": 42}',
+        timeout=1,
+        headers={"Jsonrpc-Id": "abc", "Jsonrpc-Timeout": "1"},
+    )
+    reply = await app.nc.request("natsapi.development.persons.CREATE", {"name": "bar", "age": 1}, header_envelope=True)
+    classic = await app.nc.request("natsapi.development.persons.CREATE", {"name": "baz", "age": 2})
+
+    assert json.loads(msg.data) == {"name": "foo", "age": 42}
+    assert msg.headers["Jsonrpc-Id"] == "abc"
+    assert reply.result == {"name": "bar", "age": 1}
+    assert reply.error is None
+    assert classic.result == {"name": "baz", "age": 2}
+
+
+async def test_header_envelope_errors_should_be_in_headers(app):
+    @app.request("persons.CREATE")
+    async def _(app, name: str, age: int):
+        return {"name": name}
+
+    invalid = await app.nc.request("natsapi.development.persons.CREATE", {"name": "foo"}, header_envelope=True)
+    unknown = await app.nc.nats.request(
+        "natsapi.development.persons.DELETE",
+        b"{}",
+        timeout=1,
+        headers={"Jsonrpc-Id": str(uuid4())},
+    )
+
+    assert invalid.error.code == -40001
+    assert unknown.headers["Jsonrpc-Error-Code"] == "-32601"
+    assert unknown.headers["Jsonrpc-Error-Message"] == "NO_SUCH_ENDPOINT"
+    assert json.loads(unknown.data)["code"] == -32601
+
+
+async def test_header_envelope_should_support_the_legacy_method(app):
+    router = SubjectRouter(prefix="persons")
+    received = []
+
+    @router.request("RETRIEVE")
+    async def _(app, id: int):
+        return {"id": id}
+
+    @router.publish("DELETE")
+    async def _(app, id: int):
+        received.append(id)
+
+    app.include_router(router)
+    reply = await app.nc.request("natsapi.development.persons", {"id": 1}, method="RETRIEVE", header_envelope=True)
+    await app.nc.publish("natsapi.development.persons", {"id": 2}, method="DELETE", header_envelope=True)
+    await app.nc.request("natsapi.development.schema.RETRIEVE", {})
+
+    assert isinstance(reply, JsonRPCReply)
+    assert reply.result == {"id": 1}
+    assert received == [2]
+
+
+async def test_header_envelope_bodies_that_arent_an_object_should_be_invalid(app):
+    @app.request("persons.CREATE")
+    async def _(app, name: str):
+        return {"name": name}
+
+    codes = []
+    for body in [b"[1, 2]", b'"x"', b"3", b"{not json"]:
+        msg = await app.nc.nats.request(
+            "natsapi.development.persons.CREATE",
+            body,
+            timeout=1,
+            headers={"Jsonrpc-Id": str(uuid4())},
+        )
+        codes.append(msg.headers["Jsonrpc-Error-Code"])
+    classic = await app.nc.nats.request("natsapi.development.persons.CREATE", b"{not json", timeout=1)
+
+    assert codes == ["-40001"] * 4
+    assert JsonRPCReply.parse_raw(classic.data).error.code == -40001
+
+
+async def test_header_envelope_should_reply_when_the_exception_handler_fails(app):
+    @app.request("persons.CREATE")
+    async def _(app):
+        raise ValueError("boom")
+
+    def broken_handler(exc, request, subject):
+        raise RuntimeError("handler is broken")
+
+    app.nc._exception_handlers[ValueError] = broken_handler
+
+    msg = await app.nc.nats.request(
+        "natsapi.development.persons.CREATE",
+        b"{}",
+        timeout=1,
+        headers={"Jsonrpc-Id": "abc"},
+    )
+
+    assert msg.headers["Jsonrpc-Id"] == "abc"
+    assert msg.headers["Jsonrpc-Error-Code"] == "-32603"
+
+
+async def test_header_envelope_retries_of_idempotent_routes_should_be_replayed(app):
+    calls = []
+
+    @app.request("orders.CREATE", idempotency=Idempotency())
+    async def _(app, amount: int):
+        calls.append(amount)
+        return {"order": len(calls)}
+
+    headers = {"idempotency-key": "order-1"}
+    subject = "natsapi.development.orders.CREATE"
+    first = await app.nc.request(subject, {"amount": 1}, headers=headers, header_envelope=True)
+    retry = await app.nc.request(subject, {"amount": 1}, headers=headers, header_envelope=True)
+    classic = await app.nc.request(subject, {"amount": 1}, headers=headers)
+
+    assert first.result == retry.result == classic.result == {"order": 1}
+    assert first.id != retry.id
+    assert calls == [1]
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from nats.errors import NoRespondersError
+
+from natsapi.client import Hedging
+
+
+class FakeNats:
+    def __init__(self, *latencies: float):
+        self.latencies = list(latencies)
+        self.sent = 0
+
+    async def request(self, subject, payload, timeout, headers=None):
+        latency = self.latencies[self.sent]
+        self.sent += 1
+        sent = self.sent
+        await asyncio.sleep(latency)
+        if latency < 0:
+            raise NoRespondersError
+        return SimpleNamespace(data=b"%d" % sent)
+
+
+async def test_slow_request_should_be_hedged(app):
+    calls = []
+
+    @app.request("slow_once", include_schema=False)
+    async def _(app):
+        calls.append(1)
+        await asyncio.sleep(1 if len(calls) == 1 else 0)
+        return {"call": len(calls)}
+
+    hedging = Hedging(delay=0.02)
+    started = time.monotonic()
+    reply = await app.nc.request("natsapi.development.slow_once", {}, timeout=5, hedging=hedging)
+
+    assert time.monotonic() - started < 0.5
+    assert reply.result == {"call": 2}
+    assert hedging.stats() == {"requests": 1, "hedge_sent": 1, "hedge_won": 1}
+
+
+async def test_hedge_delay_should_be_learned_per_subject():
+    hedging = Hedging(min_samples=5, percentile=0.8)
+    nats = FakeNats(*[0] * 5)
+
+    for _ in range(5):
+        await hedging.request(nats, "foo", b"", 1, None)
+    for latency in (0.1, 0.2, 0.3, 0.4, 0.5):
+        hedging.observe("bar", latency)
+
+    assert hedging.delay("foo") < 0.01
+    assert hedging.delay("bar") == 0.4
+    assert hedging.delay("baz") is None
+    assert hedging.stats()["hedge_sent"] == 0
+
+
+async def test_hedges_should_stay_within_budget():
+    hedging = Hedging(delay=0, budget=0.5, max_burst=1)
+    nats = FakeNats(*[0.01, 0] * 4)
+
+    for _ in range(4):
+        await hedging.request(nats, "foo", b"", 1, None)
+
+    assert hedging.stats()["hedge_sent"] == 2
+    assert nats.sent == 6
+
+
+async def test_hedged_request_should_only_fail_when_both_fail():
+    hedging = Hedging(delay=0.01)
+
+    reply = await hedging.request(FakeNats(0.02, -0.01), "foo", b"", 1, None)
+
+    assert reply.data == b"1"
+    assert hedging.stats()["hedge_won"] == 0
+
+
+async def test_cancelled_caller_should_cancel_every_attempt():
+    nats = FakeNats(10, 10, 10)
+    attempts = []
+    request = nats.request
+
+    async def tracked(*args, **kwargs):
+        attempts.append(asyncio.current_task())
+        return await request(*args, **kwargs)
+
+    nats.request = tracked
+    # Cancelled while waiting to hedge, and while waiting for either attempt
+    for delay in (1, 0.01):
+        caller = asyncio.create_task(Hedging(delay=delay).request(nats, "foo", b"", 60, None))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    assert len(attempts) == 3
+    assert all(attempt.cancelled() for attempt in attempts)
@@ -0,0 +1,139 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from nats.js.errors import ServiceUnavailableError
+
+from natsapi.idempotency import Idempotency, KeyValueReplyStore, MemoryReplyStore, request_id_key
+from natsapi.models import JsonRPCReply, JsonRPCRequest
+
+
+async def test_retries_with_the_same_key_should_get_the_stored_reply(app):
+    calls = []
+
+    @app.request("orders.CREATE", idempotency=Idempotency())
+    async def _(app, amount: int):
+        calls.append(amount)
+        await asyncio.sleep(0.05)
+        return {"order": len(calls)}
+
+    headers = {"idempotency-key": "order-1"}
+    first, duplicate = await asyncio.gather(
+        app.nc.request("natsapi.development.orders.CREATE", {"amount": 1}, headers=headers),
+        app.nc.request("natsapi.development.orders.CREATE", {"amount": 1}, headers=headers),
+    )
+    retry = await app.nc.request("natsapi.development.orders.CREATE", {"amount": 1}, headers=headers)
+    other = await app.nc.request("natsapi.development.orders.CREATE", {"amount": 2}, headers={"idempotency-key": "2"})
+    unkeyed = await app.nc.request("natsapi.development.orders.CREATE", {"amount": 3})
+
+    assert first.result == duplicate.result == retry.result == {"order": 1}
+    assert other.result == {"order": 2}
+    assert unkeyed.result == {"order": 3}
+    assert calls == [1, 2, 3]
+    assert app.routes["natsapi.development.orders.CREATE"].idempotency.stats() == {"replayed": 2, "in_flight": 0}
+
+
+async def test_failed_requests_should_be_executed_again(app):
+    attempts = []
+
+    @app.request("flaky", idempotency=Idempotency(key=request_id_key))
+    async def _(app):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("downstream unavailable")
+        return {"status": "OK"}
+
+    payload = JsonRPCRequest(params={}, timeout=1).json().encode()
+    first = await app.nc.nats.request("natsapi.development.flaky", payload, timeout=1)
+    retry = await app.nc.nats.request("natsapi.development.flaky", payload, timeout=1)
+    again = await app.nc.nats.request("natsapi.development.flaky", payload, timeout=1)
+
+    assert JsonRPCReply.parse_raw(first.data).error is not None
+    assert JsonRPCReply.parse_raw(retry.data).result == {"status": "OK"}
+    assert again.data == retry.data
+    assert len(attempts) == 2
+
+
+async def test_memory_reply_store_should_expire_and_evict():
+    store = MemoryReplyStore(ttl=0.01, max_entries=1)
+
+    await store.set("a", b"a", None)
+    await store.set("b", b"b", None)
+    assert await store.claim("a", None) is None
+    assert await store.claim("b", None) == b"b"
+
+    await asyncio.sleep(0.02)
+    assert await store.claim("b", None) is None
+    assert len(store) == 0
+
+
+async def test_key_value_reply_store_should_be_shared_between_instances(app):
+    bucket = "natsapi_test_" + uuid4().hex
+    first_instance = KeyValueReplyStore(bucket=bucket, max_wait=0.2, poll_interval=0.01)
+    second_instance = KeyValueReplyStore(bucket=bucket, max_wait=0.2, poll_interval=0.01)
+
+    try:
+        assert await first_instance.claim("foo:1", app.nc.nats) is None
+    except ServiceUnavailableError:
+        pytest.skip("JetStream is not enabled on the NATS server")
+
+    waiting = asyncio.create_task(second_instance.claim("foo:1", app.nc.nats))
+    await asyncio.sleep(0.05)
+    await first_instance.set("foo:1", b"reply", app.nc.nats)
+    assert await waiting == b"reply"
+
+    assert await first_instance.claim("foo:2", app.nc.nats) is None
+    await first_instance.release("foo:2", app.nc.nats)
+    assert await second_instance.claim("foo:2", app.nc.nats) is None
+
+    await app.nc.nats.jetstream().delete_key_value(bucket)
+
+
+async def test_replayed_replies_should_get_the_id_of_the_retry(app):
+    @app.request("orders.CREATE", idempotency=Idempotency())
+    async def _(app, amount: int):
+        return {"order": amount}
+
+    headers = {"idempotency-key": "order-1"}
+    subject = "natsapi.development.orders.CREATE"
+    first, retry = [
+        await app.nc.nats.request(
+            subject,
+            JsonRPCRequest(params={"amount": 1}, timeout=1).json().encode(),
+            1,
+            headers=headers,
+        )
+        for _ in range(2)
+    ]
+    first, retry = JsonRPCReply.parse_raw(first.data), JsonRPCReply.parse_raw(retry.data)
+
+    assert first.result == retry.result == {"order": 1}
+    assert first.id != retry.id
+
+
+class RecordingStore(MemoryReplyStore):
+    def __init__(self):
+        super().__init__()
+        self.released = []
+
+    async def release(self, key, nats):
+        self.released.append(key)
+
+
+async def test_cancelled_requests_should_release_their_claim():
+    store = RecordingStore()
+    idempotency = Idempotency(store=store)
+    started = asyncio.Event()
+
+    async def execute():
+        started.set()
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(idempotency.reply("orders:1", None, execute))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert store.released == ["orders:1"]
+    assert idempotency.stats()["in_flight"] == 0
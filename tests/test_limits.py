@@ -0,0 +1,159 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from nats.js.errors import ServiceUnavailableError
+
+from natsapi import NatsAPI
+from natsapi.limits import AIMDLimit, Gradient2Limit, KeyValueRateLimit, RateLimit, header_key, param_key
+from natsapi.models import JsonRPCRequest
+
+
+def test_aimd_limit_should_grow_while_used_and_back_off_when_dropped():
+    limit = AIMDLimit(initial_limit=10, backoff_ratio=0.5, timeout=1)
+
+    for _ in range(10):
+        assert limit.try_acquire()
+    limit.release(0.01)
+    assert limit.limit == 11
+
+    limit.release(0.01, dropped=True)
+    assert limit.limit == 5
+
+    limit.release(2)
+    assert limit.limit == 2
+
+
+def test_aimd_limit_should_not_grow_while_unused():
+    limit = AIMDLimit(initial_limit=10)
+
+    assert limit.try_acquire()
+    limit.release(0.01)
+
+    assert limit.limit == 10
+
+
+def test_limit_should_reject_when_full_and_not_sample_rejections():
+    limit = AIMDLimit(initial_limit=1, max_limit=1)
+
+    assert limit.try_acquire()
+    assert not limit.try_acquire()
+    limit.release(None)
+
+    assert limit.stats() == {"limit": 1, "in_flight": 0, "rejected": 1, "last_rtt": None}
+
+
+def test_gradient2_limit_should_shrink_when_latency_rises():
+    limit = Gradient2Limit(initial_limit=20, smoothing=1)
+    for _ in range(20):
+        limit.try_acquire()
+
+    for _ in range(20):
+        limit.release(0.01)
+        limit.try_acquire()
+    grown = limit.limit
+    while limit.try_acquire():
+        pass
+
+    for _ in range(5):
+        limit.release(0.1)
+        limit.try_acquire()
+
+    assert grown > 20
+    assert limit.limit < grown
+    assert limit.stats()["rtt_short"] == 0.1
+    assert limit.stats()["rtt_long"] > 0.01
+
+
+async def test_route_over_concurrency_limit_should_get_overloaded_reply(app):
+    release = asyncio.Event()
+    limit = AIMDLimit(initial_limit=1, max_limit=1)
+
+    @app.request("slow", concurrency_limit=limit)
+    async def _(app):
+        await release.wait()
+        return {"status": "done"}
+
+    slow = asyncio.create_task(app.nc.request("natsapi.development.slow", {}, timeout=5))
+    await asyncio.sleep(0.05)
+
+    reply = await app.nc.request("natsapi.development.slow", {}, timeout=1)
+    release.set()
+
+    assert reply.error.message == "SERVICE_OVERLOADED"
+    assert (await slow).result["status"] == "done"
+    assert limit.stats()["rejected"] == 1
+    assert limit.stats()["in_flight"] == 0
+    assert limit.stats()["last_rtt"] > 0
+
+
+async def test_app_concurrency_limit_should_apply_to_all_routes(client_config, event_loop):
+    limit = Gradient2Limit(initial_limit=5)
+    app = NatsAPI("natsapi.development", client_config=client_config, concurrency_limit=limit)
+
+    @app.request("foo")
+    async def _(app):
+        return {"status": "OK"}
+
+    await app.startup(loop=event_loop)
+    await app.nc.request("natsapi.development.foo", {})
+    await app.nc.request("natsapi.development.schema.RETRIEVE", {})
+    await app.shutdown(app)
+
+    assert limit.in_flight == 0
+    assert limit.stats()["rtt_long"] > 0
+
+
+async def test_rate_limit_should_refill_tokens_over_time():
+    limit = RateLimit(rate=100, burst=2)
+    request = JsonRPCRequest(params={})
+
+    assert await limit.allow("foo", request, None, None)
+    assert await limit.allow("foo", request, None, None)
+    assert not await limit.allow("foo", request, None, None)
+    await asyncio.sleep(0.02)
+    assert await limit.allow("foo", request, None, None)
+    assert limit.stats()["rejected"] == 1
+
+
+async def test_rate_limit_per_caller_should_keep_a_bucket_per_caller():
+    limit = RateLimit(rate=1, key=param_key("auth.user_id"), max_keys=2)
+
+    assert await limit.allow("foo", JsonRPCRequest(params={"auth": {"user_id": 1}}), None, None)
+    assert not await limit.allow("foo", JsonRPCRequest(params={"auth": {"user_id": 1}}), None, None)
+    assert await limit.allow("foo", JsonRPCRequest(params={"auth": {"user_id": 2}}), None, None)
+    assert await limit.allow("foo", JsonRPCRequest(params={}), None, None)
+    assert limit.stats()["callers"] == 2
+
+
+async def test_request_over_rate_limit_should_fail_before_validation(app):
+    @app.request("export", rate_limit=RateLimit(rate=0.1, key=header_key("x-caller")))
+    async def _(app, foo: int):
+        return {"foo": foo}
+
+    first = await app.nc.request("natsapi.development.export", {"foo": 1}, headers={"x-caller": "a"})
+    second = await app.nc.request("natsapi.development.export", {"foo": "invalid"}, headers={"x-caller": "a"})
+    other = await app.nc.request("natsapi.development.export", {"foo": 1}, headers={"x-caller": "b"})
+
+    assert first.result["foo"] == 1
+    assert second.error.code == -32001
+    assert second.error.message == "RATE_LIMITED"
+    assert other.result["foo"] == 1
+
+
+async def test_key_value_rate_limit_should_be_shared_between_instances(app):
+    bucket = "natsapi_test_" + uuid4().hex
+    first_instance = KeyValueRateLimit(rate=1 / 30, period=60, bucket=bucket)
+    second_instance = KeyValueRateLimit(rate=1 / 30, period=60, bucket=bucket)
+    request = JsonRPCRequest(params={})
+
+    try:
+        assert await first_instance.allow("foo", request, None, app.nc.nats)
+    except ServiceUnavailableError:
+        pytest.skip("JetStream is not enabled on the NATS server")
+
+    assert await second_instance.allow("foo", request, None, app.nc.nats)
+    assert not await first_instance.allow("foo", request, None, app.nc.nats)
+    assert await first_instance.allow("bar", request, None, app.nc.nats)
+
+    await app.nc.nats.jetstream().delete_key_value(bucket)
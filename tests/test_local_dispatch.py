@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+from nats.errors import TimeoutError
+from pydantic import BaseModel
+
+from natsapi import NatsAPI, SubjectRouter
+from natsapi.context import CTX_JSONRPC_ID
+from natsapi.models import JsonRPCReply, LazyReply
+
+
+class Person(BaseModel):
+    name: str
+
+
+@pytest.fixture(scope="function")
+async def local_app(client_config, event_loop):
+    app = NatsAPI("natsapi.development", client_config=client_config, local_dispatch=True)
+    await app.startup(loop=event_loop)
+    yield app
+    await app.shutdown(app)
+
+
+async def test_request_to_own_route_should_not_go_over_nats(local_app):
+    @local_app.request("persons.RETRIEVE")
+    async def _(app, person: Person):
+        return {"same_object": person is received, "name": person.name}
+
+    received = Person(name="foo")
+    sent = local_app.nc.nats.stats["out_msgs"]
+
+    reply = await local_app.nc.request("natsapi.development.persons.RETRIEVE", {"person": received})
+
+    assert reply.result == {"same_object": True, "name": "foo"}
+    assert local_app.nc.nats.stats["out_msgs"] == sent
+
+
+async def test_request_to_route_of_other_root_path_should_be_handled_locally(client_config, event_loop):
+    app = NatsAPI("natsapi.development", client_config=client_config, local_dispatch=True)
+    router = SubjectRouter()
+
+    @router.request("bar")
+    def _(app):
+        return {"status": "OK"}
+
+    app.include_router(router, root_path="other")
+    await app.startup(loop=event_loop)
+
+    reply = await app.nc.request("other.bar", {})
+
+    assert reply.result["status"] == "OK"
+    await app.shutdown(app)
+
+
+async def test_local_request_with_invalid_params_should_get_failed_reply(local_app):
+    @local_app.request("foo")
+    async def _(app, foo: int):
+        return {"foo": foo}
+
+    reply = await local_app.nc.request("natsapi.development.foo", {"foo": "bar"})
+
+    assert reply.error.code == -40001
+
+
+async def test_local_request_should_not_overwrite_jsonrpc_id_of_caller(local_app):
+    @local_app.request("foo")
+    async def _(app):
+        return {"jsonrpc_id": str(CTX_JSONRPC_ID.get())}
+
+    CTX_JSONRPC_ID.set("caller")
+    reply = await local_app.nc.request("natsapi.development.foo", {})
+
+    assert reply.result["jsonrpc_id"] != "caller"
+    assert CTX_JSONRPC_ID.get() == "caller"
+
+
+async def test_local_request_that_takes_too_long_should_time_out(local_app):
+    @local_app.request("sleep")
+    async def _(app):
+        await asyncio.sleep(1)
+
+    with pytest.raises(TimeoutError):
+        await local_app.nc.request("natsapi.development.sleep", {}, timeout=0.01)
+
+
+async def test_publish_to_own_route_should_be_handled_locally(local_app):
+    received = []
+
+    @local_app.publish("foo")
+    async def _(app, person: Person):
+        received.append(person)
+
+    person = Person(name="foo")
+    await local_app.nc.publish("natsapi.development.foo", {"person": person})
+    await asyncio.sleep(0.01)
+
+    assert received == [person]
+
+
+async def test_request_to_unknown_subject_should_still_go_over_nats(local_app):
+    reply = await local_app.nc.request("natsapi.development.nonexistant", {})
+    assert reply.error.code == -32601
+
+
+async def test_local_request_should_validate_into_result_model(local_app):
+    @local_app.request("persons.RETRIEVE")
+    async def _(app):
+        return {"name": "foo"}
+
+    reply = await local_app.nc.request("natsapi.development.persons.RETRIEVE", {}, result_model=Person)
+    raw = await local_app.nc.request("natsapi.development.persons.RETRIEVE", {}, raw=True)
+
+    assert reply.result == Person(name="foo")
+    assert JsonRPCReply.parse_raw(raw.data).result == {"name": "foo"}
+
+
+async def test_local_requests_and_publishes_should_take_ids_from_request_ids(local_app):
+    ids = iter(["00000000-0000-0000-0000-000000000001", "00000000-0000-0000-0000-000000000002"])
+    local_app.nc.request_ids = lambda: next(ids)
+    seen = []
+
+    @local_app.request("ids.RETRIEVE")
+    async def _(app):
+        seen.append(str(CTX_JSONRPC_ID.get()))
+        return {}
+
+    @local_app.publish("ids.CREATE")
+    async def _(app):
+        seen.append(str(CTX_JSONRPC_ID.get()))
+
+    reply = await local_app.nc.request("natsapi.development.ids.RETRIEVE", {})
+    await local_app.nc.publish("natsapi.development.ids.CREATE", {})
+    await asyncio.sleep(0.01)
+
+    assert str(reply.id) == "00000000-0000-0000-0000-000000000001"
+    assert seen == ["00000000-0000-0000-0000-000000000001", "00000000-0000-0000-0000-000000000002"]
+
+
+async def test_requests_to_raw_routes_should_go_over_nats(local_app):
+    @local_app.raw_request("files.ECHO")
+    async def _(app, data: memoryview, headers: dict[str, str] | None):
+        return data.tobytes()
+
+    sent = local_app.nc.nats.stats["out_msgs"]
+
+    reply = await local_app.nc.request("natsapi.development.files.ECHO", {"name": "foo"}, raw=True, timeout=1)
+    await local_app.nc.publish("natsapi.development.files.ECHO", {"name": "foo"})
+
+    assert b'"name":"foo"' in reply.data.replace(b" ", b"")
+    # The request, its reply and the publish
+    assert local_app.nc.nats.stats["out_msgs"] == sent + 3
+
+
+async def test_lazy_local_requests_should_get_a_lazy_reply(local_app):
+    @local_app.request("persons.RETRIEVE")
+    async def _(app, person: Person):
+        return {"name": person.name}
+
+    reply = await local_app.nc.request("natsapi.development.persons.RETRIEVE", {"person": {"name": "foo"}}, lazy=True)
+
+    assert isinstance(reply, LazyReply)
+    assert reply.result == {"name": "foo"}
+    assert JsonRPCReply.parse_raw(reply.data).result == {"name": "foo"}
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+
+from natsapi import NatsAPI
+from natsapi.exceptions import JsonRPCException
+from natsapi.middleware import BaseMiddleware, Middleware
+
+
+class RecordingMiddleware(BaseMiddleware):
+    def __init__(self, app, name: str, calls: list):
+        super().__init__(app)
+        self.name = name
+        self.calls = calls
+
+    async def dispatch(self, scope, call_next):
+        self.calls.append((self.name, scope))
+        return await call_next(scope)
+
+
+class UnauthorizedMiddleware(BaseMiddleware):
+    async def dispatch(self, scope, call_next):
+        if scope.request.params.get("auth") != "secret":
+            raise JsonRPCException(code=-27001, message="UNAUTHORIZED")
+        scope.state.user = "foo"
+        return await call_next(scope)
+
+
+async def test_middleware_should_see_raw_message_and_route(client_config, event_loop):
+    calls = []
+    app = NatsAPI("natsapi.development", client_config=client_config)
+    app.add_middleware(RecordingMiddleware, name="outer", calls=calls)
+
+    @app.request("foo")
+    async def foo(app, bar: int):
+        return {"bar": bar}
+
+    await app.startup(loop=event_loop)
+    reply = await app.nc.request("natsapi.development.foo", {"bar": 1}, headers={"x-tenant": "wegroup"})
+    await app.shutdown(app)
+
+    assert reply.result["bar"] == 1
+    _, scope = calls[0]
+    assert scope.kind == "request"
+    assert scope.subject == "natsapi.development.foo"
+    assert scope.route.endpoint is foo
+    assert json.loads(scope.data)["params"] == {"bar": 1}
+    assert scope.headers["x-tenant"] == "wegroup"
+    assert scope.received_at <= scope.dispatched_at
+
+
+async def test_last_added_middleware_should_be_outermost(client_config, event_loop):
+    calls = []
+    app = NatsAPI(
+        "natsapi.development",
+        client_config=client_config,
+        middleware=[Middleware(RecordingMiddleware, name="inner", calls=calls)],
+    )
+    app.add_middleware(RecordingMiddleware, name="outer", calls=calls)
+
+    @app.request("foo")
+    async def _(app):
+        return {"status": "OK"}
+
+    await app.startup(loop=event_loop)
+    await app.nc.request("natsapi.development.foo", {})
+    await app.shutdown(app)
+
+    assert [name for name, _ in calls] == ["outer", "inner"]
+
+
+async def test_exception_in_middleware_should_get_failed_reply(client_config, event_loop):
+    app = NatsAPI("natsapi.development", client_config=client_config)
+    app.add_middleware(UnauthorizedMiddleware)
+
+    @app.request("foo")
+    async def _(app):
+        return {"status": "OK"}
+
+    await app.startup(loop=event_loop)
+    unauthorized = await app.nc.request("natsapi.development.foo", {})
+    authorized = await app.nc.request("natsapi.development.foo", {"auth": "secret"})
+    await app.shutdown(app)
+
+    assert unauthorized.error.message == "UNAUTHORIZED"
+    assert authorized.result["status"] == "OK"
+
+
+async def test_middleware_should_wrap_publish(client_config, event_loop):
+    calls = []
+    app = NatsAPI("natsapi.development", client_config=client_config)
+    app.add_middleware(RecordingMiddleware, name="outer", calls=calls)
+
+    @app.publish("foo")
+    async def _(app):
+        pass
+
+    await app.startup(loop=event_loop)
+    await app.nc.publish("natsapi.development.foo", {})
+    await asyncio.sleep(0.1)
+    await app.shutdown(app)
+
+    assert calls[0][1].kind == "publish"
+
+
+async def test_middleware_should_wrap_local_dispatch(client_config, event_loop):
+    calls = []
+    app = NatsAPI("natsapi.development", client_config=client_config, local_dispatch=True)
+    app.add_middleware(RecordingMiddleware, name="outer", calls=calls)
+
+    @app.request("foo")
+    async def _(app):
+        return {"status": "OK"}
+
+    await app.startup(loop=event_loop)
+    await app.nc.request("natsapi.development.foo", {})
+    await app.shutdown(app)
+
+    assert calls[0][1].data is None
+
+
+async def test_add_middleware_after_startup_should_fail(app):
+    with pytest.raises(RuntimeError):
+        app.add_middleware(UnauthorizedMiddleware)
+
+
+async def test_no_middleware_should_not_build_stack(app):
+    assert app.nc._middleware_stack is None
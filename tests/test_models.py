@@ -1,10 +1,14 @@
-from uuid import uuid4
+import gc
+import weakref
+from datetime import datetime
+from uuid import UUID, uuid4
 
 import pytest
 from pydantic import BaseModel, ValidationError
 from pydantic.fields import Field
 
-from natsapi.models import JsonRPCError, JsonRPCReply, JsonRPCRequest
+from natsapi import models
+from natsapi.models import JsonRPCError, JsonRPCReply, JsonRPCRequest, RequestIds, encode_request
 
 
 def test_change_param_type_of_model_should_change():
@@ -39,3 +43,41 @@ def test_jsponrpcerror_timestamp_is_generated_on_creation():
     error_1 = JsonRPCError(code=1, message="", data=None)
     error_2 = JsonRPCError(code=1, message="", data=None)
     assert error_1.timestamp != error_2.timestamp
+
+
+def test_request_ids_should_be_unique_uuids():
+    ids = RequestIds()
+    other = RequestIds()
+
+    generated = {ids() for _ in range(1000)} | {other() for _ in range(1000)}
+
+    assert len(generated) == 2000
+    assert all(str(UUID(id)) == id for id in generated)
+
+
+def test_request_ids_should_be_reset_after_fork_without_being_kept_alive():
+    ids = RequestIds()
+    first = ids()
+    models._reset_request_ids()
+    # Another random prefix
+    assert ids()[:19] != first[:19]
+
+    collected = weakref.ref(ids)
+    del ids
+    gc.collect()
+    assert collected() is None
+
+
+def test_encoded_request_should_be_a_valid_request():
+    class Status(BaseModel):
+        status: str
+
+    id = RequestIds()()
+    params = {"id": uuid4(), "at": datetime(2020, 1, 1), "result": Status(status="OK")}
+
+    request = JsonRPCRequest.parse_raw(encode_request(params, id=id, timeout=5, method="RETRIEVE"))
+
+    assert str(request.id) == id
+    assert request.timeout == 5
+    assert request.method == "RETRIEVE"
+    assert request.params == {"id": str(params["id"]), "at": "2020-01-01T00:00:00", "result": {"status": "OK"}}
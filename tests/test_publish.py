@@ -1,3 +1,8 @@
+import asyncio
+
+import pytest
+from nats import errors
+
 from natsapi import NatsAPI
 
 
@@ -13,3 +18,101 @@ async def test_send_publish_should_be_called(client_config, event_loop):
     await app.nc.publish("natsapi.development.foo", {})
     await app.shutdown(app)
     assert app.count == 1
+
+
+async def test_publish_many_should_deliver_every_message(client_config, event_loop):
+    app = NatsAPI("natsapi.development", client_config=client_config)
+    app.received = []
+
+    @app.publish(subject="foo")
+    async def _(app, n: int):
+        app.received.append(n)
+
+    await app.startup(loop=event_loop)
+    writes = app.nc.nats.stats["out_msgs"]
+    published = await app.nc.publish_many("natsapi.development.foo", [{"n": n} for n in range(500)], flush=True)
+    assert published == 500
+    assert app.nc.nats.stats["out_msgs"] == writes + 500
+    while len(app.received) < 500:
+        await asyncio.sleep(0.01)
+    await app.shutdown(app)
+    assert sorted(app.received) == list(range(500))
+
+
+async def test_publish_many_should_take_pairs_of_subject_and_params(client_config, event_loop):
+    app = NatsAPI("natsapi.development", client_config=client_config)
+    app.received = []
+
+    @app.publish(subject="foo")
+    async def _(app, n: int):
+        app.received.append(("foo", n))
+
+    @app.publish(subject="bar")
+    async def _(app, n: int):
+        app.received.append(("bar", n))
+
+    await app.startup(loop=event_loop)
+    pairs = [("natsapi.development.foo", {"n": 1}), ("natsapi.development.bar", {"n": 2})]
+    await app.nc.publish_many(pairs, headers={"X-Trace": "abc"}, flush=True)
+    while len(app.received) < 2:
+        await asyncio.sleep(0.01)
+    await app.shutdown(app)
+    assert sorted(app.received) == [("bar", 2), ("foo", 1)]
+
+
+async def test_publish_many_should_reject_a_batch_with_a_bad_subject(client_config, event_loop):
+    app = NatsAPI("natsapi.development", client_config=client_config)
+    await app.startup(loop=event_loop)
+    writes = app.nc.nats.stats["out_msgs"]
+    with pytest.raises(errors.BadSubjectError):
+        await app.nc.publish_many([("natsapi.development.foo", {}), ("not a subject", {})])
+    assert app.nc.nats.stats["out_msgs"] == writes
+    await app.shutdown(app)
+
+
+async def test_publish_many_should_check_the_whole_batch_before_publishing(client_config, event_loop):
+    app = NatsAPI("natsapi.development", client_config=client_config, local_dispatch=True)
+    app.count = 0
+
+    @app.publish(subject="foo")
+    async def _(app):
+        app.count += 1
+
+    await app.startup(loop=event_loop)
+    writes = app.nc.nats.stats["out_msgs"]
+    batch = [("natsapi.development.foo", {}), ("elsewhere.foo", {}), ("not a subject", {})]
+    with pytest.raises(errors.BadSubjectError):
+        await app.nc.publish_many(batch)
+    with pytest.raises(errors.BadHeaderError):
+        await app.nc.publish_many(batch[:2], headers={"not a header": "x"})
+    await asyncio.sleep(0.01)
+    assert app.count == 0
+    assert app.nc.nats.stats["out_msgs"] == writes
+    await app.shutdown(app)
+
+
+async def test_publish_many_should_check_room_in_the_pending_buffer_while_reconnecting(
+    client_config,
+    event_loop,
+    monkeypatch,
+):
+    client_config.connect.pending_size = 1024
+    app = NatsAPI("natsapi.development", client_config=client_config, local_dispatch=True)
+    app.count = 0
+
+    @app.publish(subject="foo")
+    async def _(app):
+        app.count += 1
+
+    await app.startup(loop=event_loop)
+    monkeypatch.setattr(type(app.nc.nats), "is_connected", property(lambda self: False))
+    batch = [("natsapi.development.foo", {}), *(("elsewhere.foo", {"n": n}) for n in range(100))]
+    with pytest.raises(errors.OutboundBufferLimitError):
+        await app.nc.publish_many(batch)
+    await asyncio.sleep(0.01)
+    assert app.count == 0
+    assert app.nc.nats.pending_data_size == 0
+
+    assert await app.nc.publish_many(batch[:2]) == 2
+    monkeypatch.undo()
+    await app.shutdown(app)
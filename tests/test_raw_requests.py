@@ -0,0 +1,47 @@
+import pytest
+
+from natsapi import SubjectRouter
+from natsapi.exceptions import JsonRPCException
+
+
+async def test_raw_request_should_get_body_and_reply_with_bytes(app):
+    received = {}
+
+    @app.raw_request("files.ECHO")
+    async def _(app, data: memoryview, headers: dict[str, str] | None):
+        received["type"] = type(data)
+        received["headers"] = headers
+        return data.tobytes()[::-1]
+
+    blob = bytes(range(256))
+    reply = await app.nc.request_raw("natsapi.development.files.ECHO", blob, headers={"x-name": "blob.bin"})
+
+    assert reply.data == blob[::-1]
+    assert reply.error is None
+    assert reply.id == received["headers"]["Jsonrpc-Id"]
+    assert received["type"] is memoryview
+    assert received["headers"]["x-name"] == "blob.bin"
+    assert received["headers"]["Jsonrpc-Timeout"] == "60"
+
+
+async def test_raw_request_that_fails_should_reply_with_error_headers(app):
+    router = SubjectRouter(prefix="files")
+
+    @router.raw_request("MISSING")
+    def _(app, data, headers):
+        raise JsonRPCException(code=-27404, message="FILE_NOT_FOUND")
+
+    app.include_router(router)
+    reply = await app.nc.request_raw("natsapi.development.files.MISSING", b"")
+
+    assert reply.headers["Jsonrpc-Error-Code"] == "-27404"
+    assert reply.headers["Jsonrpc-Error-Message"] == "FILE_NOT_FOUND"
+    assert reply.error.code == -27404
+
+
+def test_raw_endpoint_should_take_data_and_headers(app):
+    with pytest.raises(AssertionError):
+
+        @app.raw_request("files.UPLOAD")
+        def _(app, file: bytes):
+            pass
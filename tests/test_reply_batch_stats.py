@@ -0,0 +1,37 @@
+import asyncio
+
+from natsapi.client import ReplyBatchStats
+
+
+async def test_a_single_reply_should_be_written_on_its_own(app):
+    @app.request("echo.RETRIEVE", include_schema=False)
+    async def _(app, n: int):
+        return {"n": n}
+
+    app.nc.reply_batch_stats = batch_stats = ReplyBatchStats()
+
+    reply = await asyncio.wait_for(app.nc.request("natsapi.development.echo.RETRIEVE", {"n": 1}), 1)
+
+    assert reply.result == {"n": 1}
+    assert batch_stats.stats()["batches"] == 1
+    assert batch_stats.stats()["recent_max_batch_size"] == 1
+
+
+async def test_replies_under_load_should_be_written_in_batches(app):
+    @app.request("echo.RETRIEVE", include_schema=False)
+    async def _(app, n: int):
+        return {"n": n}
+
+    app.nc.reply_batch_stats = batch_stats = ReplyBatchStats()
+    subject = "natsapi.development.echo.RETRIEVE"
+
+    replies = await asyncio.gather(*[app.nc.request(subject, {"n": n}) for n in range(200)])
+    header_replies = await asyncio.gather(*[app.nc.request(subject, {"n": n}, header_envelope=True) for n in range(50)])
+
+    assert [reply.result["n"] for reply in replies] == list(range(200))
+    assert [reply.result["n"] for reply in header_replies] == list(range(50))
+    stats = batch_stats.stats()
+    assert stats["replies"] == 250
+    assert stats["batches"] < 250
+    assert stats["recent_max_batch_size"] > 1
+    assert stats["mean_batch_size"] > 1
@@ -0,0 +1,114 @@
+import asyncio
+
+from natsapi.client import ReplyCache
+
+
+async def test_replies_should_be_kept_for_the_ttl_of_the_route(app):
+    calls = []
+
+    @app.request("countries.RETRIEVE", include_schema=False, cache_ttl=60)
+    async def _(app, code: str):
+        calls.append(code)
+        if code == "XX":
+            raise ValueError("unknown country")
+        return {"code": code}
+
+    app.nc.cache = cache = ReplyCache()
+    subject = "natsapi.development.countries.RETRIEVE"
+
+    first = await app.nc.request(subject, {"code": "BE"})
+    second = await app.nc.request(subject, {"code": "BE"})
+    other = await app.nc.request(subject, {"code": "NL"})
+    header = await app.nc.request(subject, {"code": "NL"}, header_envelope=True)
+    await app.nc.request(subject, {"code": "XX"})
+    await app.nc.request(subject, {"code": "XX"})
+
+    assert first.result == second.result == {"code": "BE"}
+    assert other.result == header.result == {"code": "NL"}
+    assert calls == ["BE", "NL", "NL", "XX", "XX"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 3
+
+
+async def test_replies_should_be_kept_for_the_ttl_of_the_call(app):
+    calls = []
+
+    @app.request("time.RETRIEVE", include_schema=False)
+    async def _(app):
+        calls.append(1)
+        return {"call": len(calls)}
+
+    app.nc.cache = ReplyCache()
+    subject = "natsapi.development.time.RETRIEVE"
+
+    uncached = [await app.nc.request(subject, {}) for _ in range(2)]
+    cached = [await app.nc.request(subject, {}, cache_ttl=0.05) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    expired = await app.nc.request(subject, {}, cache_ttl=0.05)
+
+    assert [reply.result["call"] for reply in uncached] == [1, 2]
+    assert [reply.result["call"] for reply in cached] == [3, 3]
+    assert expired.result["call"] == 4
+
+
+async def test_replies_should_be_invalidated_by_the_serving_app(app):
+    calls = []
+
+    @app.request("countries.RETRIEVE", include_schema=False, cache_ttl=60)
+    async def _(app, code: str):
+        calls.append(code)
+        return {"code": code}
+
+    cache = ReplyCache()
+    await cache.start(app.nc.nats)
+    app.nc.cache = cache
+    subject = "natsapi.development.countries.RETRIEVE"
+
+    await app.nc.request(subject, {"code": "BE"})
+    await app.nc.invalidate_cache(subject)
+    await app.nc.nats.flush()
+    await asyncio.sleep(0.01)
+    await app.nc.request(subject, {"code": "BE"})
+
+    assert calls == ["BE", "BE"]
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_least_recently_used_replies_should_be_evicted():
+    class Msg:
+        def __init__(self, data):
+            self.data = data
+
+    cache = ReplyCache(max_entries=2, max_bytes=10)
+
+    cache.set(("a",), Msg(b"1234"), 60)
+    cache.set(("b",), Msg(b"1234"), 60)
+    cache.get(("a",))
+    cache.set(("c",), Msg(b"1234"), 60)
+    cache.set(("d",), Msg(b"x" * 11), 60)
+
+    assert cache.get(("a",)) is not None
+    assert cache.get(("b",)) is None
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hit_ratio"] == 2 / 3
+
+
+async def test_header_envelope_replies_should_be_kept(app):
+    calls = []
+
+    @app.request("countries.RETRIEVE", include_schema=False, cache_ttl=60)
+    async def _(app, code: str):
+        calls.append(code)
+        return {"code": code}
+
+    app.nc.cache = cache = ReplyCache()
+    subject = "natsapi.development.countries.RETRIEVE"
+
+    first = await app.nc.request(subject, {"code": "BE"}, header_envelope=True)
+    second = await app.nc.request(subject, {"code": "BE"}, header_envelope=True)
+
+    assert first.result == second.result == {"code": "BE"}
+    assert calls == ["BE"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 1
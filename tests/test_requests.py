@@ -1,6 +1,8 @@
+import asyncio
+
 from pydantic import BaseModel
 
-from natsapi import NatsAPI, SubjectRouter
+from natsapi import NatsAPI, RawResult, SubjectRouter
 from natsapi.context import CTX_JSONRPC_ID
 from natsapi.exceptions import JsonRPCException
 from natsapi.models import JsonRPCReply, JsonRPCRequest
@@ -190,3 +192,123 @@ async def test_send_request_should_store_jsonrpc_id_in_contextvars(app):
     reply = JsonRPCReply.parse_raw(reply_raw.data)
 
     assert reply.result["jsonrpc_id"] == str(json_rpc_payload.id)
+
+
+async def test_enforced_timeout_should_cancel_handler_and_reply_with_timeout_error(app):
+    cancelled = asyncio.Event()
+
+    @app.request("stuck", suggested_timeout=0.05, enforce_timeout=True)
+    async def stuck(app):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    @app.request("caller_bound", suggested_timeout=10, enforce_timeout=True)
+    async def caller_bound(app):
+        await asyncio.sleep(10)
+
+    reply = await app.nc.request("natsapi.development.stuck", {}, timeout=1)
+    caller_reply = await app.nc.nats.request(
+        "natsapi.development.caller_bound",
+        JsonRPCRequest(params={}, timeout=0.05).json().encode(),
+        timeout=1,
+    )
+
+    assert reply.error.code == -32002
+    assert reply.error.message == "REQUEST_TIMEOUT"
+    assert cancelled.is_set()
+    assert JsonRPCReply.parse_raw(caller_reply.data).error.message == "REQUEST_TIMEOUT"
+    assert app.routes["natsapi.development.stuck"].timed_out == 1
+    assert app.routes["natsapi.development.caller_bound"].timed_out == 1
+
+
+async def test_timeout_should_not_be_enforced_by_default(app):
+    @app.request("slow", suggested_timeout=0.01)
+    async def _(app):
+        await asyncio.sleep(0.05)
+        return {"status": "OK"}
+
+    reply = await app.nc.request("natsapi.development.slow", {}, timeout=1)
+
+    assert reply.result["status"] == "OK"
+    assert app.routes["natsapi.development.slow"].timed_out == 0
+
+
+async def test_oversized_payload_should_be_rejected_before_parsing(app):
+    @app.request("upload", max_payload=256)
+    async def _(app, data: str):
+        return {"size": len(data)}
+
+    small = await app.nc.request("natsapi.development.upload", {"data": "x"})
+    large = await app.nc.request("natsapi.development.upload", {"data": "x" * 300})
+    junk = await app.nc.nats.request("natsapi.development.upload", b"{" * 300, timeout=1)
+
+    assert small.result["size"] == 1
+    assert large.error.code == -32003
+    assert large.error.message == "PAYLOAD_TOO_LARGE"
+    assert JsonRPCReply.parse_raw(junk.data).error.code == -32003
+
+
+async def test_unroutable_junk_should_get_no_such_endpoint_without_parsing(app):
+    reply = await app.nc.nats.request("natsapi.development.nonexistant", b"not even json", timeout=1)
+
+    assert JsonRPCReply.parse_raw(reply.data).error.message == "NO_SUCH_ENDPOINT"
+
+
+async def test_raw_result_should_be_put_in_the_reply_as_is(app):
+    @app.request("documents.RETRIEVE", result=StatusResult)
+    async def _(app, id: int):
+        return RawResult(b'{"status": "cached", "id": %d}' % id)
+
+    payload = JsonRPCRequest(params={"id": 1}, timeout=1).json().encode()
+    raw = await app.nc.nats.request("natsapi.development.documents.RETRIEVE", payload, timeout=1)
+    reply = await app.nc.request("natsapi.development.documents.RETRIEVE", {"id": 2})
+    header = await app.nc.request("natsapi.development.documents.RETRIEVE", {"id": 3}, header_envelope=True)
+    schema = await app.nc.request("natsapi.development.schema.RETRIEVE", {})
+
+    assert b'"result": {"status": "cached", "id": 1}' in raw.data
+    assert JsonRPCReply.parse_raw(raw.data).id == JsonRPCRequest.parse_raw(payload).id
+    assert reply.result == {"status": "cached", "id": 2}
+    assert header.result == {"status": "cached", "id": 3}
+    assert "StatusResult" in schema.result["components"]["schemas"]
+
+
+async def test_raw_result_that_isnt_an_object_should_be_an_error(app):
+    @app.request("documents.RETRIEVE")
+    async def _(app, data: str):
+        return RawResult(data)
+
+    array = await app.nc.request("natsapi.development.documents.RETRIEVE", {"data": "[1, 2]"})
+    scalar = await app.nc.request("natsapi.development.documents.RETRIEVE", {"data": "3"})
+
+    assert array.error.message == scalar.error.message == "A RawResult must be a JSON object"
+
+
+async def test_reply_should_be_decoded_as_requested(app):
+    @app.request("status.RETRIEVE", result=StatusResult)
+    async def _(app, fail: bool = False):
+        if fail:
+            raise BrokerAlreadyExists()
+        return StatusResult(status="OK")
+
+    typed = await app.nc.request("natsapi.development.status.RETRIEVE", {}, result_model=StatusResult)
+    typed_error = await app.nc.request("natsapi.development.status.RETRIEVE", {"fail": True}, result_model=StatusResult)
+    header = await app.nc.request(
+        "natsapi.development.status.RETRIEVE",
+        {},
+        result_model=StatusResult,
+        header_envelope=True,
+    )
+    raw = await app.nc.request("natsapi.development.status.RETRIEVE", {}, raw=True)
+    lazy = await app.nc.request("natsapi.development.status.RETRIEVE", {}, lazy=True)
+
+    assert typed.result == StatusResult(status="OK")
+    assert typed_error.error.code == -27001
+    assert header.result == StatusResult(status="OK")
+    assert JsonRPCReply.parse_raw(raw.data).result == {"status": "OK"}
+    assert "reply" not in vars(lazy)
+    assert lazy.result == {"status": "OK"}
+    assert lazy.error is None
+    assert lazy.id == JsonRPCReply.parse_raw(lazy.data).id
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+from nats.errors import NoRespondersError, TimeoutError
+
+from natsapi.client import RetryBudget, RetryPolicy
+from natsapi.exceptions import JsonRPCRateLimitedException
+
+
+async def test_retryable_error_codes_should_be_retried(app):
+    calls = []
+
+    @app.request("flaky", include_schema=False)
+    async def _(app, fail: bool = False):
+        calls.append(1)
+        if fail:
+            raise ValueError("not retryable")
+        if len(calls) < 3:
+            raise JsonRPCRateLimitedException()
+        return {"status": "OK"}
+
+    budget = RetryBudget()
+    retry = RetryPolicy(max_attempts=3, base_delay=0.001, budget=budget)
+
+    reply = await app.nc.request("natsapi.development.flaky", {}, timeout=1, retry=retry)
+    failed = await app.nc.request("natsapi.development.flaky", {"fail": True}, timeout=1, retry=retry)
+
+    assert reply.result == {"status": "OK"}
+    assert failed.error is not None
+    assert len(calls) == 4
+    assert budget.stats() == {"requests": 2, "retries": 2, "rejected": 0}
+
+
+async def test_errors_should_be_raised_when_out_of_attempts(app):
+    budget = RetryBudget()
+    app.nc.retry = RetryPolicy(max_attempts=2, base_delay=0.001, budget=budget)
+
+    with pytest.raises(NoRespondersError):
+        await app.nc.request("nobody.home", {}, timeout=1)
+
+    assert budget.retries == 1
+
+
+async def test_retries_should_stay_within_budget():
+    budget = RetryBudget(ratio=0.5, max_tokens=1)
+    retry = RetryPolicy(max_attempts=5, base_delay=0, budget=budget)
+    attempts = []
+
+    async def send(timeout):
+        attempts.append(timeout)
+        raise TimeoutError
+
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            await retry.run(send, 1)
+
+    assert len(attempts) == 5
+    assert budget.stats() == {"requests": 3, "retries": 2, "rejected": 3}
+
+
+async def test_retries_should_stop_at_the_deadline():
+    retry = RetryPolicy(max_attempts=100, base_delay=0.01, max_delay=0.01, deadline=0.1, budget=RetryBudget())
+    attempts = []
+
+    async def send(timeout):
+        attempts.append(timeout)
+        raise TimeoutError
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        await retry.run(send, 1)
+
+    assert time.monotonic() - started < 0.2
+    assert 1 < len(attempts) < 100
+    assert all(timeout <= 0.1 for timeout in attempts)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from natsapi import NatsAPI, SubjectRouter
+
+
+def shard_router(shard: int) -> SubjectRouter:
+    router = SubjectRouter()
+
+    @router.request("shards.count", include_schema=False)
+    async def _(app):
+        await asyncio.sleep(0.01 * shard)
+        return {"shard": shard}
+
+    return router
+
+
+@pytest.fixture(scope="function")
+async def shards(client_config, event_loop):
+    apps = []
+    for shard in range(3):
+        app = NatsAPI("natsapi.development", client_config=client_config)
+        app.include_router(shard_router(shard))
+        await app.startup(loop=event_loop)
+        # Make sure the server has the subscription before the first request goes out
+        await app.nc.nats.flush()
+        apps.append(app)
+    yield apps
+    for app in apps:
+        await app.shutdown(app)
+
+
+async def test_request_all_should_collect_a_reply_of_every_responder(shards):
+    replies = await shards[0].nc.request_all("natsapi.development.shards.count", {}, timeout=0.5)
+
+    assert sorted(reply.result["shard"] for reply in replies) == [0, 1, 2]
+
+
+async def test_request_all_should_stop_early(shards):
+    nc = shards[0].nc
+    subject = "natsapi.development.shards.count"
+
+    two = await nc.request_all(subject, {}, timeout=5, max_replies=2)
+    first = await nc.request_all(subject, {}, timeout=5, early_stop=lambda reply: reply.error is None)
+    none = await nc.request_all("nobody.home", {}, timeout=0.05)
+    streamed = [reply.result["shard"] async for reply in nc.stream_replies(subject, {}, timeout=0.5)]
+
+    assert len(two) == 2
+    assert len(first) == 1
+    assert none == []
+    assert streamed == [0, 1, 2]
+
+
+async def test_replies_that_cant_be_decoded_should_be_skipped(shards):
+    nc = shards[0].nc
+    subject = "natsapi.development.shards.count"
+
+    async def junk(msg):
+        await msg.respond(b"not json")
+
+    sub = await nc.nats.subscribe(subject, cb=junk)
+    replies = await nc.request_all(subject, {}, timeout=0.5)
+    await sub.unsubscribe()
+
+    assert sorted(reply.result["shard"] for reply in replies) == [0, 1, 2]
@@ -0,0 +1,158 @@
+import asyncio
+from types import SimpleNamespace
+
+from natsapi import NatsAPI, SubjectRouter
+from natsapi.scheduling import FairScheduler, PriorityScheduler, header_tenant, param_tenant, root_path_tenant
+
+
+def message(tenant: str) -> SimpleNamespace:
+    return SimpleNamespace(subject="natsapi.development.foo", data=b"{}", headers={"tenant": tenant})
+
+
+async def test_scheduler_should_share_capacity_by_weight():
+    scheduler = FairScheduler(header_tenant("tenant"), max_concurrency=1, weights={"b": 2})
+    release = asyncio.Event()
+    started = []
+
+    def handle(tenant):
+        async def _():
+            started.append(tenant)
+            await release.wait()
+
+        return _
+
+    scheduler.submit(message("blocker"), None, handle("blocker"))
+    for _ in range(4):
+        scheduler.submit(message("a"), None, handle("a"))
+    for _ in range(4):
+        scheduler.submit(message("b"), None, handle("b"))
+
+    assert scheduler.stats()["queued"] == 8
+    assert scheduler.stats()["tenants"]["a"]["queued"] == 4
+
+    release.set()
+    while scheduler.running or scheduler.queued:
+        await asyncio.sleep(0.01)
+
+    assert started == ["blocker", "a", "b", "b", "a", "b", "b", "a", "a"]
+    assert scheduler.stats()["tenants"]["a"]["wait"]["count"] == 4
+    assert scheduler.stats()["tenants"]["a"]["queued"] == 0
+
+
+def test_tenant_keys():
+    msg = SimpleNamespace(subject="acme.persons.create", data=b'{"params": {"auth": {"tenant": 7}}}', headers=None)
+    route = SimpleNamespace(subject="persons.create")
+
+    assert header_tenant("tenant")(msg, route) is None
+    assert param_tenant("auth.tenant")(msg, route) == "7"
+    assert param_tenant("tenant")(msg, route) is None
+    assert root_path_tenant()(msg, route) == "acme"
+    assert root_path_tenant()(msg, None) is None
+
+
+async def test_app_with_scheduler_should_handle_requests_per_root_path(client_config, event_loop):
+    scheduler = FairScheduler(root_path_tenant(), max_concurrency=2)
+    app = NatsAPI("natsapi.development", client_config=client_config, scheduler=scheduler)
+    router = SubjectRouter()
+
+    @router.request("foo")
+    async def _(app):
+        await asyncio.sleep(0.01)
+        return {"status": "OK"}
+
+    app.include_router(router, root_path="tenant_a")
+    app.include_router(router, root_path="tenant_b")
+    await app.startup(loop=event_loop)
+
+    replies = await asyncio.gather(
+        *[app.nc.request(f"tenant_{tenant}.foo", {}, timeout=5) for tenant in "ab" for _ in range(3)],
+    )
+    await app.shutdown(app)
+
+    assert all(reply.result["status"] == "OK" for reply in replies)
+    assert scheduler.stats()["tenants"]["tenant_a"]["wait"]["count"] == 3
+    assert scheduler.stats()["tenants"]["tenant_b"]["wait"]["count"] == 3
+
+
+async def test_priority_scheduler_should_serve_higher_lanes_first():
+    scheduler = PriorityScheduler(max_concurrency=1, header="x-priority")
+    release = asyncio.Event()
+    started = []
+
+    def handle(name):
+        async def _():
+            started.append(name)
+            await release.wait()
+
+        return _
+
+    normal, bulk, control = (SimpleNamespace(priority=priority) for priority in ("normal", "bulk", "control"))
+    scheduler.submit(SimpleNamespace(headers=None), normal, handle("blocker"))
+    scheduler.submit(SimpleNamespace(headers=None), bulk, handle("bulk"))
+    scheduler.submit(SimpleNamespace(headers=None), normal, handle("normal"))
+    scheduler.submit(SimpleNamespace(headers={"x-priority": "high"}), bulk, handle("raised"))
+    scheduler.submit(SimpleNamespace(headers={"x-priority": "control"}), normal, handle("not control"))
+    scheduler.submit(SimpleNamespace(headers={"x-priority": "bulk"}), control, handle("control"))
+    await asyncio.sleep(0)
+
+    assert started == ["blocker", "control"]
+    assert scheduler.stats()["lanes"]["normal"]["queued"] == 2
+
+    release.set()
+    while scheduler.running or scheduler.queued:
+        await asyncio.sleep(0.01)
+
+    assert started == ["blocker", "control", "raised", "normal", "not control", "bulk"]
+
+
+async def test_priority_scheduler_should_not_starve_lower_lanes():
+    scheduler = PriorityScheduler(max_concurrency=1, max_wait=0.01)
+    high, bulk = SimpleNamespace(priority="high"), SimpleNamespace(priority="bulk")
+    msg = SimpleNamespace(headers=None)
+    started = []
+
+    def handle(name):
+        async def _():
+            started.append(name)
+            await asyncio.sleep(0.02)
+
+        return _
+
+    scheduler.submit(msg, high, handle("high"))
+    scheduler.submit(msg, bulk, handle("bulk"))
+    for _ in range(3):
+        scheduler.submit(msg, high, handle("high"))
+
+    while scheduler.running or scheduler.queued:
+        await asyncio.sleep(0.01)
+
+    assert started.index("bulk") < 4
+    assert scheduler.stats()["promoted"] == 1
+
+
+async def test_control_routes_should_bypass_queued_work(client_config, event_loop):
+    app = NatsAPI("natsapi.development", client_config=client_config, scheduler=PriorityScheduler(max_concurrency=1))
+    release = asyncio.Event()
+
+    @app.request("slow", include_schema=False)
+    async def _(app):
+        await release.wait()
+        return {"status": "done"}
+
+    @app.request("healthz", include_schema=False, priority="control")
+    async def _(app):
+        return {"status": "OK"}
+
+    await app.startup(loop=event_loop)
+    slow = [asyncio.create_task(app.nc.request("natsapi.development.slow", {}, timeout=5)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+
+    health = await app.nc.request("natsapi.development.healthz", {}, timeout=1)
+    schema = await app.nc.request("natsapi.development.schema.RETRIEVE", {}, timeout=1)
+    release.set()
+    await asyncio.gather(*slow)
+    await app.shutdown(app)
+
+    assert health.result["status"] == "OK"
+    assert schema.result is not None
+    assert app.nc.scheduler.stats()["lanes"]["control"]["wait"]["count"] == 2